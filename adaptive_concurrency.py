@@ -0,0 +1,167 @@
+"""adaptive_concurrency.py tunes how many crawl tasks run at once from what the crawl is observing.
+
+A fixed concurrency is either too timid or gets the scraper throttled, which shows up as timeouts and
+cities that silently come back empty. `AdaptiveController` applies AIMD (additive increase,
+multiplicative decrease) to the number of active browser contexts and to the pause between two
+navigations: after every window of finished tasks it looks at the error rate, the empty-result rate and
+the task latency, backs off hard when any of them degrades and otherwise probes one step higher.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import logging
+import statistics
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class AdaptiveController:  # pylint: disable=too-many-instance-attributes
+    """The `AdaptiveController` class limits the number of running tasks and paces navigations.
+
+    Parameters
+    ----------
+    max_concurrency : int
+        The `max_concurrency` parameter is the largest number of tasks allowed to run at once, usually the
+    size of the context pool.
+    min_concurrency : int
+        The `min_concurrency` parameter is the smallest number of tasks kept running.
+    window : int
+        The `window` parameter is the number of finished tasks looked at before each adjustment.
+    max_error_rate : float
+        The `max_error_rate` parameter is the share of failed tasks in a window above which the controller
+    backs off.
+    max_empty_rate : float
+        The `max_empty_rate` parameter is the share of tasks without any job in a window above which the
+    controller backs off.
+    latency_factor : float
+        The `latency_factor` parameter is how many times slower than the best window the median task may
+    get before the controller backs off.
+    max_pacing : float
+        The `max_pacing` parameter is the longest pause, in seconds, enforced between two task starts.
+
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int,
+        *,
+        min_concurrency: int = 1,
+        window: int = 8,
+        max_error_rate: float = 0.2,
+        max_empty_rate: float = 0.5,
+        latency_factor: float = 2.0,
+        max_pacing: float = 30.0,
+    ) -> None:
+        self.max_concurrency = max(1, max_concurrency)
+        self.min_concurrency = max(1, min(min_concurrency, self.max_concurrency))
+        self.window = window
+        self.max_error_rate = max_error_rate
+        self.max_empty_rate = max_empty_rate
+        self.latency_factor = latency_factor
+        self.max_pacing = max_pacing
+
+        self.limit = max(self.min_concurrency, self.max_concurrency // 2)
+        self.pacing = 0.0
+        self.active = 0
+        self.adjustments = 0
+        self.best_latency: float | None = None
+        self._results: list[tuple[float, int | None]] = []
+        self._next_start = 0.0
+        self._condition = asyncio.Condition()
+
+    @contextlib.asynccontextmanager
+    async def slot(self):
+        """The `slot` context manager waits until fewer than `limit` tasks run and holds a place meanwhile."""
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.active < self.limit)
+            self.active += 1
+        try:
+            yield
+        finally:
+            async with self._condition:
+                self.active -= 1
+                self._condition.notify_all()
+
+    async def pace(self) -> None:
+        """The `pace` method sleeps so that two task starts are at least `pacing` seconds apart."""
+        now = time.monotonic()
+        start = max(now, self._next_start)
+        self._next_start = start + self.pacing
+        if start > now:
+            await asyncio.sleep(start - now)
+
+    async def record(self, latency: float, jobs_count: int | None) -> None:
+        """The `record` method adds the outcome of a finished task and adjusts once a window is full.
+
+        Parameters
+        ----------
+        latency : float
+            The `latency` parameter is the number of seconds the task took.
+        jobs_count : int | None
+            The `jobs_count` parameter is the number of jobs the task found, or None if the task failed.
+
+        """
+        self._results.append((latency, jobs_count))
+        if len(self._results) < self.window:
+            return
+
+        results, self._results = self._results, []
+        error_rate = sum(jobs is None for _, jobs in results) / len(results)
+        empty_rate = sum(jobs == 0 for _, jobs in results) / len(results)
+        latencies = [latency for latency, jobs in results if jobs]
+        median_latency = statistics.median(latencies) if latencies else None
+
+        reasons = []
+        if error_rate > self.max_error_rate:
+            reasons.append(f"error rate {error_rate:.0%}")
+        if empty_rate > self.max_empty_rate:
+            reasons.append(f"empty rate {empty_rate:.0%}")
+        if (
+            median_latency is not None
+            and self.best_latency is not None
+            and median_latency > self.best_latency * self.latency_factor
+        ):
+            reasons.append(f"median latency {median_latency:.1f}s")
+
+        if median_latency is not None:
+            self.best_latency = min(self.best_latency or median_latency, median_latency)
+
+        if reasons:
+            self._adjust(
+                max(self.min_concurrency, self.limit // 2),
+                min(self.max_pacing, max(1.0, self.pacing * 2)),
+                "back off: " + ", ".join(reasons),
+            )
+        elif self.limit < self.max_concurrency or self.pacing:
+            self._adjust(
+                min(self.max_concurrency, self.limit + 1),
+                self.pacing / 2 if self.pacing >= 0.5 else 0.0,
+                "probe up",
+            )
+
+        # Waiters must re-check the new limit
+        async with self._condition:
+            self._condition.notify_all()
+
+    def _adjust(self, limit: int, pacing: float, reason: str) -> None:
+        """The `_adjust` method applies and logs a new limit and pacing, `reason` says what caused it."""
+        if (limit, pacing) == (self.limit, self.pacing):
+            return
+        logger.info(
+            f"Adaptive concurrency {self.limit} -> {limit}, "
+            f"pacing {self.pacing:.1f}s -> {pacing:.1f}s ({reason})"
+        )
+        self.limit, self.pacing = limit, pacing
+        self.adjustments += 1
+
+    def summary(self) -> dict:
+        """The `summary` method returns the current settings of the controller as a dictionary."""
+        return {
+            "limit": self.limit,
+            "pacing": self.pacing,
+            "adjustments": self.adjustments,
+            "best_latency": self.best_latency,
+        }
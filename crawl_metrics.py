@@ -0,0 +1,302 @@
+"""crawl_metrics.py measures where the time of a crawl goes and exports it for later comparison.
+
+`CrawlMetrics` collects the latency of every phase of a query (launch, goto, waiting for the first job
+card, each scroll step, parsing, extracting a job, saving), timeout counts per kind and the outcome of
+every city. At the end of a crawl it writes a JSON summary and, optionally, a Prometheus textfile with
+the p50/p95/p99 latency of every phase, so two runs can be compared phase by phase.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import json
+import math
+import os
+from pathlib import Path
+import sys
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+PERCENTILES = (0.5, 0.95, 0.99)
+
+
+def percentile(sorted_values: list[float], fraction: float) -> float:
+    """The `percentile` function returns the nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def peak_rss_mb() -> float | None:
+    """The `peak_rss_mb` function returns the peak resident memory of this process in MB.
+
+    It returns None where the `resource` module is not available, such as on Windows.
+
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes everywhere else
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def child_pids(pid: int) -> list[int]:
+    """The `child_pids` function returns every descendant process of `pid`, read from `/proc` on Linux."""
+    children = []
+    pending = [pid]
+    while pending:
+        parent = pending.pop()
+        for task in Path(f"/proc/{parent}/task").glob("*/children"):
+            try:
+                pids = [
+                    int(child) for child in task.read_text(encoding="ascii").split()
+                ]
+            except OSError:
+                # The process exited while it was being read
+                continue
+            children.extend(pids)
+            pending.extend(pids)
+    return children
+
+
+def process_tree_usage(pid: int | None = None) -> dict | None:
+    """The `process_tree_usage` function sums the memory and CPU time of the descendants of a process.
+
+    Browsers run as child processes of the Playwright driver, itself a child of the scraper, so this is
+    the footprint of the browser side of the crawl. It returns None where `/proc` is not available.
+
+    Parameters
+    ----------
+    pid : int | None
+        The `pid` parameter is the process whose descendants are measured, this process by default.
+
+    Returns
+    -------
+        A dictionary with the number of `processes`, their total `rss_mb`, which counts shared pages once
+    per process, and their `cpu_seconds`.
+
+    """
+    if not Path("/proc/self/stat").exists():
+        return None
+
+    page_size = os.sysconf("SC_PAGE_SIZE")
+    ticks = os.sysconf("SC_CLK_TCK")
+    usage = {"processes": 0, "rss_mb": 0.0, "cpu_seconds": 0.0}
+    for child in child_pids(pid or os.getpid()):
+        try:
+            # The command name in it is whatever bytes the process chose
+            stat = Path(f"/proc/{child}/stat").read_text(
+                encoding="utf-8", errors="replace"
+            )
+            rss_pages = int(
+                Path(f"/proc/{child}/statm").read_text(encoding="ascii").split()[1]
+            )
+        except OSError:
+            continue
+        # The command name may contain spaces, the fields after it are fixed
+        fields = stat.rsplit(")", 1)[1].split()
+        usage["processes"] += 1
+        usage["rss_mb"] += rss_pages * page_size / (1024 * 1024)
+        usage["cpu_seconds"] += (int(fields[11]) + int(fields[12])) / ticks
+
+    usage["rss_mb"] = round(usage["rss_mb"], 1)
+    usage["cpu_seconds"] = round(usage["cpu_seconds"], 2)
+    return usage
+
+
+def browser_usage() -> dict | None:
+    """The `browser_usage` function returns `process_tree_usage` of the browsers launched by Playwright.
+
+    Only the descendants of the Playwright driver are counted, so parse worker processes and the driver
+    itself are left out. It returns None where `/proc` is not available.
+
+    """
+    if not Path("/proc/self/stat").exists():
+        return None
+    for child in Path(f"/proc/{os.getpid()}/task").glob("*/children"):
+        try:
+            pids = child.read_text(encoding="ascii").split()
+        except OSError:
+            # The thread exited while it was being read
+            continue
+        for pid in pids:
+            try:
+                cmdline = Path(f"/proc/{pid}/cmdline").read_bytes()
+            except OSError:
+                continue
+            if b"playwright" in cmdline:
+                return process_tree_usage(int(pid))
+    return {"processes": 0, "rss_mb": 0.0, "cpu_seconds": 0.0}
+
+
+class CrawlMetrics:
+    """The `CrawlMetrics` class collects phase latencies, timeouts and per-city results of a crawl."""
+
+    def __init__(self) -> None:
+        self.started = time.monotonic()
+        self.phases: dict[str, list[float]] = {}
+        self.timeouts: dict[str, int] = {}
+        self.cities: list[dict] = []
+        self.scroll_steps = 0
+        self.scroll_steps_max = 0
+        self.scroll_exhausted = 0
+
+    @contextlib.contextmanager
+    def phase(self, name: str):
+        """The `phase` context manager adds the time spent in its block to the latencies of `name`."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def observe(self, name: str, seconds: float) -> None:
+        """The `observe` method adds one latency, in seconds, to the phase `name`."""
+        self.phases.setdefault(name, []).append(seconds)
+
+    def timeout(self, kind: str) -> None:
+        """The `timeout` method counts one timeout of the given `kind`, such as `goto` or `plateau`."""
+        self.timeouts[kind] = self.timeouts.get(kind, 0) + 1
+
+    def record_scroll(self, steps: int, max_scroll: int) -> None:
+        """The `record_scroll` method counts the scroll steps a query used out of the `max_scroll` allowed."""
+        self.scroll_steps += steps
+        self.scroll_steps_max += max_scroll
+        if max_scroll and steps >= max_scroll:
+            # The list may have had more jobs than the scroll limit let through
+            self.scroll_exhausted += 1
+
+    def record_city(
+        self, query: str, city: str, *, cards: int, jobs: int, seconds: float
+    ) -> None:
+        """The `record_city` method stores the outcome of one query.
+
+        Parameters
+        ----------
+        query : str
+            The `query` parameter is the Google search of the task.
+        city : str
+            The `city` parameter is the city of the task.
+        cards : int
+            The `cards` parameter is the number of job cards loaded on the page.
+        jobs : int
+            The `jobs` parameter is the number of jobs saved after deduplication.
+        seconds : float
+            The `seconds` parameter is the time the whole query took.
+
+        """
+        self.cities.append(
+            {
+                "query": query,
+                "city": city,
+                "cards": cards,
+                "jobs": jobs,
+                "seconds": round(seconds, 3),
+            }
+        )
+
+    def summary(self) -> dict:
+        """The `summary` method returns every collected metric as a JSON serializable dictionary."""
+        elapsed = time.monotonic() - self.started
+        jobs = sum(city["jobs"] for city in self.cities)
+
+        phases = {}
+        for name, values in sorted(self.phases.items()):
+            values = sorted(values)
+            phases[name] = {
+                "count": len(values),
+                "sum": round(sum(values), 3),
+                "max": round(values[-1], 3),
+                **{
+                    f"p{round(q * 100)}": round(percentile(values, q), 3)
+                    for q in PERCENTILES
+                },
+            }
+
+        return {
+            "elapsed_seconds": round(elapsed, 3),
+            "peak_rss_mb": peak_rss_mb(),
+            "cities": len(self.cities),
+            "cards": sum(city["cards"] for city in self.cities),
+            "jobs": jobs,
+            "jobs_per_second": round(jobs / elapsed, 3) if elapsed else 0.0,
+            "scroll_steps": self.scroll_steps,
+            "scroll_steps_max": self.scroll_steps_max,
+            "scroll_exhausted": self.scroll_exhausted,
+            "timeouts": dict(sorted(self.timeouts.items())),
+            "phases": phases,
+            "per_city": self.cities,
+        }
+
+    def write_json(self, path: str) -> None:
+        """The `write_json` method writes `summary` to the JSON file `path`."""
+        with open(path, "w", encoding="utf-8") as outfile:
+            json.dump(self.summary(), outfile, indent=4)
+
+    def write_prometheus(self, path: str, prefix: str = "google_jobs") -> None:
+        """The `write_prometheus` method writes the metrics in the Prometheus text format.
+
+        The file is written next to `path` first and then renamed over it, so the node exporter textfile
+        collector never reads a half written file.
+
+        Parameters
+        ----------
+        path : str
+            The `path` parameter is the `.prom` file to write.
+        prefix : str
+            The `prefix` parameter is prepended to the name of every metric.
+
+        """
+        summary = self.summary()
+        lines = [
+            f"# HELP {prefix}_phase_seconds Latency of every phase of a query.",
+            f"# TYPE {prefix}_phase_seconds summary",
+        ]
+        for name, values in sorted(self.phases.items()):
+            values = sorted(values)
+            for q in PERCENTILES:
+                lines.append(
+                    f'{prefix}_phase_seconds{{phase="{name}",quantile="{q}"}} '
+                    f"{percentile(values, q):.6f}"
+                )
+            lines.append(
+                f'{prefix}_phase_seconds_sum{{phase="{name}"}} {sum(values):.6f}'
+            )
+            lines.append(
+                f'{prefix}_phase_seconds_count{{phase="{name}"}} {len(values)}'
+            )
+
+        lines.append(f"# HELP {prefix}_timeouts_total Timeouts per kind.")
+        lines.append(f"# TYPE {prefix}_timeouts_total counter")
+        for kind, count in sorted(self.timeouts.items()):
+            lines.append(f'{prefix}_timeouts_total{{kind="{kind}"}} {count}')
+
+        for name, kind, help_text in (
+            ("cities", "counter", "Queries crawled."),
+            ("cards", "counter", "Job cards loaded."),
+            ("jobs", "counter", "Jobs saved after deduplication."),
+            ("jobs_per_second", "gauge", "Jobs saved per second of crawl."),
+            ("scroll_steps", "counter", "Scroll steps used."),
+            ("scroll_steps_max", "counter", "Scroll steps allowed by max_scroll."),
+            ("scroll_exhausted", "counter", "Queries that used every scroll step."),
+            ("elapsed_seconds", "gauge", "Duration of the crawl."),
+            ("peak_rss_mb", "gauge", "Peak resident memory of the scraper process."),
+        ):
+            if summary[name] is None:
+                continue
+            metric = (
+                f"{prefix}_{name}_total" if kind == "counter" else f"{prefix}_{name}"
+            )
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} {kind}")
+            lines.append(f"{metric} {summary[name]}")
+
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as outfile:
+            outfile.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, path)
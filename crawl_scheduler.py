@@ -0,0 +1,256 @@
+"""crawl_scheduler.py runs `(term, city)` crawl tasks concurrently over a single shared browser.
+
+One browser is launched for the whole sweep and a bounded pool of `BrowserContext`s is kept open on it.
+Each context is owned by a worker that pulls tasks from an asyncio queue, so a slow city only holds up
+its own worker while the others keep draining the queue. Tasks can also be leased one at a time from a
+queue shared with other processes. Contexts, and the browser itself, can be replaced between tasks to keep
+the memory of long sweeps in check.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Awaitable, Callable, Iterable
+import contextlib
+import logging
+import time
+from typing import Optional
+
+from playwright.async_api import Browser, BrowserContext
+
+from adaptive_concurrency import AdaptiveController
+from recycling import BROWSER, RecyclePolicy
+
+logger = logging.getLogger(__name__)
+
+Task = tuple[str, str]
+TaskHandler = Callable[[BrowserContext, str, str], Awaitable[Optional[int]]]
+ContextSetup = Callable[[BrowserContext], Awaitable[None]]
+ContextOptions = Callable[[], dict]
+BrowserFactory = Callable[[], Awaitable[Browser]]
+TaskSource = Callable[[], Awaitable[Optional[Task]]]
+
+
+class CrawlScheduler:  # pylint: disable=too-many-instance-attributes
+    """The `CrawlScheduler` class feeds `(term, city)` tasks to a pool of browser contexts.
+
+    Parameters
+    ----------
+    browser : Browser
+        The `browser` parameter is the already launched browser every context of the pool is created on.
+    handler : TaskHandler
+        The `handler` parameter is the coroutine function called as `handler(context, term, city)` for
+    every task taken from the queue. It returns the number of jobs found.
+    concurrency : int
+        The `concurrency` parameter is the number of browser contexts, and therefore tasks, that run at
+    the same time.
+    context_setup : ContextSetup | None
+        The `context_setup` parameter is an optional coroutine function called with every new context
+    before it runs its first task, e.g. to install request routing.
+    controller : AdaptiveController | None
+        The `controller` parameter, when given, decides how many of the `concurrency` contexts may run a
+    task at the same time and how far apart navigations start, from the outcome of every task.
+    context_options : ContextOptions | None
+        The `context_options` parameter is an optional function returning the keyword arguments passed to
+    `browser.new_context`, called for every new context.
+    context_teardown : ContextSetup | None
+        The `context_teardown` parameter is an optional coroutine function called with every context right
+    before it is closed, e.g. to save its storage state.
+    recycle : RecyclePolicy | None
+        The `recycle` parameter, when given, is asked after every task whether the context or the whole
+    browser should be replaced. A replaced context is closed before its worker takes the next task. A
+    browser is only relaunched once every running task has finished, and no task starts in the meantime.
+    browser_factory : BrowserFactory | None
+        The `browser_factory` parameter is the coroutine function launching a new browser when the
+    `recycle` policy asks for one. Without it, only the context is replaced.
+
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        browser: Browser,
+        handler: TaskHandler,
+        *,
+        concurrency: int = 1,
+        context_setup: ContextSetup | None = None,
+        controller: AdaptiveController | None = None,
+        context_options: ContextOptions | None = None,
+        context_teardown: ContextSetup | None = None,
+        recycle: RecyclePolicy | None = None,
+        browser_factory: BrowserFactory | None = None,
+    ) -> None:
+        self.browser = browser
+        self.handler = handler
+        self.concurrency = max(1, concurrency)
+        self.context_setup = context_setup
+        self.controller = controller
+        self.context_options = context_options
+        self.context_teardown = context_teardown
+        self.recycle = recycle
+        self.browser_factory = browser_factory
+        self.queue: asyncio.Queue[Task] = asyncio.Queue()
+        self.failed: list[Task] = []
+        # Bumped on every browser relaunch, contexts of an older generation died with their browser
+        self.generation = 0
+        self.open_contexts = 0
+        self._busy = 0
+        self._relaunching = False
+        self._browser_state = asyncio.Condition()
+
+    async def _worker(self, worker_id: int, next_task: TaskSource) -> None:
+        """The `_worker` coroutine owns one browser context and runs tasks on it until `next_task` runs dry.
+
+        The context is created for the first task and replaced whenever the `recycle` policy says so.
+
+        """
+        context, generation, pages = None, self.generation, 0
+        # The whole loop is guarded, the context of the last task is closed however the loop ends
+        try:  # pylint: disable=too-many-try-statements
+            while True:
+                # Leasing can wait on the other workers of a queue, which must not hold up a slot
+                task = await next_task()
+                if task is None:
+                    break
+                async with self._slot():
+                    await self._begin_task()
+                    try:
+                        if generation != self.generation:
+                            context = None
+                        if context is None:
+                            context, generation, pages = await self._new_context()
+                        await self._run_task(worker_id, context, *task)
+                        pages += 1
+                    finally:
+                        await self._end_task()
+
+                decision = None
+                if self.recycle is not None:
+                    decision = self.recycle.check(pages, self.open_contexts)
+                if decision is not None:
+                    await self._close_context(context, generation)
+                    context = None
+                    if decision == BROWSER and self.browser_factory is not None:
+                        await self._relaunch_browser()
+                    else:
+                        self.recycle.context_recycles += 1
+        finally:
+            if context is not None:
+                await self._close_context(context, generation)
+
+    async def _new_context(self) -> tuple[BrowserContext, int, int]:
+        """The `_new_context` coroutine opens a set up context, with its generation and page count."""
+        options = self.context_options() if self.context_options else {}
+        context = await self.browser.new_context(**options)
+        self.open_contexts += 1
+        if self.context_setup is not None:
+            await self.context_setup(context)
+        return context, self.generation, 0
+
+    async def _close_context(self, context: BrowserContext, generation: int) -> None:
+        """The `_close_context` coroutine tears down and closes `context` unless its browser is gone."""
+        if generation != self.generation:
+            # Already closed along with the browser it belonged to
+            return
+        self.open_contexts -= 1
+        if self.context_teardown is not None:
+            await self.context_teardown(context)
+        await context.close()
+
+    async def _begin_task(self) -> None:
+        """The `_begin_task` coroutine waits out a browser relaunch and counts the task as running."""
+        async with self._browser_state:
+            await self._browser_state.wait_for(lambda: not self._relaunching)
+            self._busy += 1
+
+    async def _end_task(self) -> None:
+        """The `_end_task` coroutine counts the task as finished and wakes a waiting relaunch."""
+        async with self._browser_state:
+            self._busy -= 1
+            self._browser_state.notify_all()
+
+    async def _relaunch_browser(self) -> None:
+        """The `_relaunch_browser` coroutine drains the running tasks and replaces the browser."""
+        async with self._browser_state:
+            if self._relaunching:
+                return
+            self._relaunching = True
+            await self._browser_state.wait_for(lambda: self._busy == 0)
+
+        try:
+            logger.debug(f"Relaunching the browser with {self.open_contexts} contexts")
+            await self.browser.close()
+            self.browser = await self.browser_factory()
+            self.generation += 1
+            self.open_contexts = 0
+            self.recycle.relaunched()
+        finally:
+            async with self._browser_state:
+                self._relaunching = False
+                self._browser_state.notify_all()
+
+    def _slot(self):
+        """The `_slot` method returns the context manager a task holds while it runs."""
+        if self.controller is None:
+            return contextlib.nullcontext()
+        return self.controller.slot()
+
+    async def _run_task(
+        self, worker_id: int, context: BrowserContext, term: str, city: str
+    ) -> None:
+        """The `_run_task` coroutine runs the handler on one task, recording its failure and outcome."""
+        if self.controller is not None:
+            await self.controller.pace()
+
+        start = time.monotonic()
+        jobs_count = None
+        try:
+            jobs_count = await self.handler(context, term, city)
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            # One broken city must not take the whole sweep down with it
+            logger.debug(f"Worker {worker_id} failed `{term} in {city}`: {e}")
+            self.failed.append((term, city))
+        finally:
+            if self.controller is not None:
+                await self.controller.record(time.monotonic() - start, jobs_count)
+
+    async def _next_queued(self) -> Task | None:
+        """The `_next_queued` coroutine returns the next queued task, or None once the queue is empty."""
+        if self.queue.empty():
+            return None
+        return self.queue.get_nowait()
+
+    async def run(self, tasks: Iterable[Task]) -> None:
+        """The `run` method queues all `tasks` and returns once every one of them has been handled.
+
+        Parameters
+        ----------
+        tasks : Iterable[Task]
+            The `tasks` parameter is an iterable of `(term, city)` tuples to crawl.
+
+        """
+        for task in tasks:
+            self.queue.put_nowait(task)
+
+        pool_size = min(self.concurrency, self.queue.qsize())
+        logger.debug(f"Crawling {self.queue.qsize()} tasks with {pool_size} contexts")
+        await self._run_workers(pool_size, self._next_queued)
+
+    async def run_leased(self, lease: TaskSource) -> None:
+        """The `run_leased` method crawls the tasks returned by `lease` until it returns None.
+
+        Parameters
+        ----------
+        lease : TaskSource
+            The `lease` parameter is a coroutine function every context calls for its next task, such as
+        `TaskQueue.lease` when the tasks are shared with other processes.
+
+        """
+        logger.debug(f"Crawling leased tasks with {self.concurrency} contexts")
+        await self._run_workers(self.concurrency, lease)
+
+    async def _run_workers(self, pool_size: int, next_task: TaskSource) -> None:
+        """The `_run_workers` coroutine runs `pool_size` workers until `next_task` runs dry."""
+        await asyncio.gather(*(self._worker(i, next_task) for i in range(pool_size)))
+
+        if self.failed:
+            logger.debug(f"{len(self.failed)} tasks failed: {self.failed}")
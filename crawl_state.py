@@ -0,0 +1,171 @@
+"""crawl_state.py keeps a SQLite journal of the `(term, city)` tasks of a crawl so it can be resumed.
+
+Every task is recorded as `pending`, `in_flight`, `done` or `failed`. When a task is done, the positions
+reached in the NDJSON output and sightings files are stored with it, so a resumed crawl can cut off
+whatever an interrupted task had half written, skip the completed tasks and retry the rest.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterable
+import logging
+import sqlite3
+import time
+
+logger = logging.getLogger(__name__)
+
+Task = tuple[str, str]
+
+PENDING = "pending"
+IN_FLIGHT = "in_flight"
+DONE = "done"
+FAILED = "failed"
+
+
+class CrawlJournal:
+    """The `CrawlJournal` class records the state of every crawl task in a SQLite file.
+
+    Parameters
+    ----------
+    path : str
+        The `path` parameter is the SQLite file of the journal. It is created if it does not exist.
+
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.connection = sqlite3.connect(path, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS tasks (
+                term TEXT NOT NULL,
+                city TEXT NOT NULL,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                output_part INTEGER,
+                output_offset INTEGER,
+                sightings_part INTEGER,
+                sightings_offset INTEGER,
+                error TEXT,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (term, city)
+            );
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            );
+            """)
+
+    def reset(self) -> None:
+        """The `reset` method forgets every task and setting of a previous crawl."""
+        self.connection.execute("DELETE FROM tasks")
+        self.connection.execute("DELETE FROM meta")
+
+    def get_meta(self, key: str) -> str | None:
+        """The `get_meta` method returns the value stored for `key`, or None."""
+        row = self.connection.execute(
+            "SELECT value FROM meta WHERE key = ?", (key,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key: str, value: str) -> None:
+        """The `set_meta` method stores `value` for `key`."""
+        self.connection.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value)
+        )
+
+    def add_tasks(self, tasks: Iterable[Task]) -> None:
+        """The `add_tasks` method records `tasks` as pending, keeping the state of already known ones."""
+        now = time.time()
+        self.connection.executemany(
+            "INSERT OR IGNORE INTO tasks (term, city, status, updated_at) VALUES (?, ?, ?, ?)",
+            [(term, city, PENDING, now) for term, city in tasks],
+        )
+
+    def remaining(self, tasks: Iterable[Task]) -> list[Task]:
+        """The `remaining` method returns the tasks of `tasks` that are not done yet, in the given order."""
+        done = set(
+            self.connection.execute(
+                "SELECT term, city FROM tasks WHERE status = ?", (DONE,)
+            ).fetchall()
+        )
+        return [task for task in tasks if task not in done]
+
+    def _set_status(self, term: str, city: str, status: str, **fields) -> None:
+        """The `_set_status` method sets the status of a task, and the columns in `fields` with it."""
+        columns = "".join(f", {name} = ?" for name in fields)
+        self.connection.execute(
+            f"UPDATE tasks SET status = ?, updated_at = ?{columns} WHERE term = ? AND city = ?",
+            (status, time.time(), *fields.values(), term, city),
+        )
+
+    def mark_in_flight(self, term: str, city: str) -> None:
+        """The `mark_in_flight` method records that the task was handed to a worker."""
+        self.connection.execute(
+            "UPDATE tasks SET attempts = attempts + 1 WHERE term = ? AND city = ?",
+            (term, city),
+        )
+        self._set_status(term, city, IN_FLIGHT)
+
+    def mark_done(
+        self,
+        term: str,
+        city: str,
+        output_part: int,
+        output_offset: int,
+        *,
+        sightings_position: tuple[int, int] = (0, 0),
+    ) -> None:
+        """The `mark_done` method records that the task finished and how far the output and sightings
+        files reached then.
+
+        """
+        sightings_part, sightings_offset = sightings_position
+        self._set_status(
+            term,
+            city,
+            DONE,
+            output_part=output_part,
+            output_offset=output_offset,
+            sightings_part=sightings_part,
+            sightings_offset=sightings_offset,
+            error=None,
+        )
+
+    def mark_failed(self, term: str, city: str, error: str) -> None:
+        """The `mark_failed` method records that the task raised `error`."""
+        self._set_status(term, city, FAILED, error=error)
+
+    def output_checkpoint(self) -> tuple[int, int] | None:
+        """The `output_checkpoint` method returns the furthest `(part, offset)` of the output reached by a
+        done task, or None if no task is done yet.
+
+        """
+        return self.connection.execute(
+            "SELECT output_part, output_offset FROM tasks WHERE status = ? "
+            "ORDER BY output_part DESC, output_offset DESC LIMIT 1",
+            (DONE,),
+        ).fetchone()
+
+    def sightings_checkpoint(self) -> tuple[int, int] | None:
+        """The `sightings_checkpoint` method returns the furthest `(part, offset)` of the sightings file
+        reached by a done task, or None if no task is done yet.
+
+        """
+        return self.connection.execute(
+            "SELECT sightings_part, sightings_offset FROM tasks WHERE status = ? "
+            "ORDER BY sightings_part DESC, sightings_offset DESC LIMIT 1",
+            (DONE,),
+        ).fetchone()
+
+    def counts(self) -> dict[str, int]:
+        """The `counts` method returns the number of tasks per status."""
+        return dict(
+            self.connection.execute(
+                "SELECT status, COUNT(*) FROM tasks GROUP BY status"
+            ).fetchall()
+        )
+
+    def close(self) -> None:
+        """The `close` method closes the SQLite connection."""
+        self.connection.close()
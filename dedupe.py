@@ -0,0 +1,251 @@
+"""dedupe.py suppresses job postings that were already scraped under another `"{term} in {city}"` query.
+
+Every posting gets a fingerprint built from its normalized title, employer and a hash of its description.
+Fingerprints are kept in a `FingerprintSet`, which is an exact in-memory set until it grows past a
+configurable size and then turns into a Bloom filter, and which is persisted between runs. Repeated
+postings are not written again; they are only recorded as extra `(city, query)` sightings.
+"""
+
+from __future__ import annotations
+
+import base64
+import hashlib
+import json
+import logging
+import math
+from pathlib import Path
+
+from ndjson_sink import NdjsonSink
+
+logger = logging.getLogger(__name__)
+
+
+def normalize(text: str) -> str:
+    """The `normalize` function lowercases `text` and collapses its whitespace."""
+    return " ".join(text.lower().split())
+
+
+def job_fingerprint(title: str, employer: str, job_description: str) -> str:
+    """The `job_fingerprint` function returns a stable identity for a job posting.
+
+    Parameters
+    ----------
+    title : str
+        The `title` parameter is the job title as shown on the listing.
+    employer : str
+        The `employer` parameter is the employer name as shown on the listing.
+    job_description : str
+        The `job_description` parameter is the full description of the job.
+
+    Returns
+    -------
+        A hex digest combining the normalized title, employer and the hash of the normalized description.
+
+    """
+    description_hash = hashlib.sha1(normalize(job_description).encode()).hexdigest()
+    key = "\x1f".join([normalize(title), normalize(employer), description_hash])
+    return hashlib.sha1(key.encode()).hexdigest()
+
+
+class BloomFilter:
+    """The `BloomFilter` class is a fixed size probabilistic set of fingerprints.
+
+    Parameters
+    ----------
+    capacity : int
+        The `capacity` parameter is the number of items the filter is sized for.
+    error_rate : float
+        The `error_rate` parameter is the false positive rate expected once `capacity` items were added.
+
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.001) -> None:
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item: str) -> list[int]:
+        """The `_positions` method returns the bits of `item`, by double hashing one digest."""
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[p >> 3] & (1 << (p & 7)) for p in self._positions(item))
+
+    def add(self, item: str) -> None:
+        """The `add` method sets the bits of `item`."""
+        for p in self._positions(item):
+            self.bits[p >> 3] |= 1 << (p & 7)
+        self.count += 1
+
+
+class FingerprintSet:
+    """The `FingerprintSet` class remembers the fingerprints of every posting already scraped.
+
+    Parameters
+    ----------
+    max_items : int
+        The `max_items` parameter is the number of fingerprints kept in an exact set. Past that size the
+    set is folded into a `BloomFilter` sized for `bloom_factor` times as many items.
+    bloom_factor : int
+        The `bloom_factor` parameter is how much headroom the Bloom filter gets over `max_items`.
+
+    """
+
+    def __init__(self, max_items: int = 1_000_000, bloom_factor: int = 10) -> None:
+        self.max_items = max_items
+        self.bloom_factor = bloom_factor
+        self.items: set[str] = set()
+        self.bloom: BloomFilter | None = None
+
+    def __contains__(self, fingerprint: str) -> bool:
+        if self.bloom is not None:
+            return fingerprint in self.bloom
+        return fingerprint in self.items
+
+    def __len__(self) -> int:
+        return self.bloom.count if self.bloom is not None else len(self.items)
+
+    def add(self, fingerprint: str) -> None:
+        """The `add` method records `fingerprint`, switching to a Bloom filter past `max_items`."""
+        if self.bloom is not None:
+            self.bloom.add(fingerprint)
+            return
+
+        self.items.add(fingerprint)
+        if len(self.items) > self.max_items:
+            logger.debug(f"{len(self.items)} fingerprints, switching to a Bloom filter")
+            self.bloom = BloomFilter(self.max_items * self.bloom_factor)
+            for item in self.items:
+                self.bloom.add(item)
+            self.items = set()
+
+    def add_from_output(self, paths: list[Path]) -> None:
+        """The `add_from_output` method adds the fingerprints of the records saved in NDJSON `paths`.
+
+        A record saved as an updated revision of a listing is added under the same
+        `"{fingerprint}:{content_hash}"` key that `Deduplicator.check` gave it.
+        """
+        for path in paths:
+            if not path.exists():
+                continue
+            with open(path, "r", encoding="utf-8") as file:
+                for line in file:
+                    if not line.strip():
+                        continue
+                    record = json.loads(line)
+                    if record.get("status") == "updated":
+                        self.add(f"{record['fingerprint']}:{record['content_hash']}")
+                    else:
+                        self.add(record["fingerprint"])
+
+    def save(self, path: str) -> None:
+        """The `save` method writes the fingerprints to the JSON file at `path`."""
+        if self.bloom is not None:
+            state = {
+                "mode": "bloom",
+                "size": self.bloom.size,
+                "hashes": self.bloom.hashes,
+                "count": self.bloom.count,
+                "bits": base64.b64encode(self.bloom.bits).decode(),
+            }
+        else:
+            state = {"mode": "set", "items": sorted(self.items)}
+
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(state, file)
+
+    @classmethod
+    def load(cls, path: str, max_items: int = 1_000_000) -> "FingerprintSet":
+        """The `load` method reads a `FingerprintSet` saved with `save`, or returns an empty one."""
+        fingerprints = cls(max_items)
+        if not Path(path).exists():
+            return fingerprints
+
+        with open(path, "r", encoding="utf-8") as file:
+            state = json.load(file)
+
+        if state["mode"] == "bloom":
+            bloom = BloomFilter.__new__(BloomFilter)
+            bloom.size = state["size"]
+            bloom.hashes = state["hashes"]
+            bloom.count = state["count"]
+            bloom.bits = bytearray(base64.b64decode(state["bits"]))
+            fingerprints.bloom = bloom
+        else:
+            for item in state["items"]:
+                fingerprints.add(item)
+
+        logger.debug(f"Loaded {len(fingerprints)} fingerprints from '{path}'")
+        return fingerprints
+
+
+class Deduplicator:
+    """The `Deduplicator` class decides whether a scraped posting is new and records repeated sightings.
+
+    Parameters
+    ----------
+    fingerprints : FingerprintSet
+        The `fingerprints` parameter holds the postings seen so far, in this run and in previous ones.
+    sightings : NdjsonSink
+        The `sightings` parameter is the NDJSON writer that repeated sightings are appended to as
+    `{"fingerprint", "city", "query"}` lines, pointing back at the original record.
+
+    """
+
+    def __init__(self, fingerprints: FingerprintSet, sightings: NdjsonSink) -> None:
+        self.fingerprints = fingerprints
+        self.sightings = sightings
+        self.duplicates = 0
+
+    def check(
+        self, fingerprint: str, city: str, query: str, revision: str | None = None
+    ) -> bool:
+        """The `check` method returns True for a new posting and records a sighting for a repeated one.
+
+        Parameters
+        ----------
+        fingerprint : str
+            The `fingerprint` parameter is the `job_fingerprint` of the posting.
+        city : str
+            The `city` parameter is the city the posting was found in.
+        query : str
+            The `query` parameter is the Google search the posting was found with.
+        revision : str | None
+            The `revision` parameter, when given, is the content hash of a posting that changed since an
+        earlier crawl. The fingerprint leaves the highlights out, so the new revision is checked under
+        both, and saved once even though its fingerprint was seen before.
+
+        Returns
+        -------
+            True if the posting was not seen before and should be saved, False otherwise.
+
+        """
+        key = fingerprint if revision is None else f"{fingerprint}:{revision}"
+        if key not in self.fingerprints:
+            self.fingerprints.add(key)
+            return True
+
+        self.duplicates += 1
+        self.sightings.write({"fingerprint": fingerprint, "city": city, "query": query})
+        return False
+
+    def record_seen(self, key: str, city: str, query: str) -> None:
+        """The `record_seen` method records a sighting of a listing an incremental crawl did not extract.
+
+        Parameters
+        ----------
+        key : str
+            The `key` parameter is the `listing_key` of the listing, saved on its original record.
+        city : str
+            The `city` parameter is the city the listing was found in.
+        query : str
+            The `query` parameter is the Google search the listing was found with.
+
+        """
+        self.sightings.write(
+            {"listing_key": key, "status": "seen", "city": city, "query": query}
+        )
@@ -0,0 +1,221 @@
+"""engine_benchmark.py compares browser engines on the same set of recorded results pages.
+
+The captures of a `--record` directory are served by `mock_server.py` on localhost and crawled with the
+regular `run` pipeline once per engine, every other request being aborted. For each engine it reports
+the page-ready time (navigation to first job card), the extraction time, the RSS of the browser per
+context and the jobs per core-hour, counting the CPU time of both the browser and this process.
+
+Usage:
+
+    python engine_benchmark.py captures --engines firefox chromium webkit --concurrency 4
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+from pathlib import Path
+import tempfile
+import time
+
+from playwright.async_api import BrowserContext, async_playwright
+
+from browser_engines import ENGINES, LAUNCH_PRESETS, launch_browser
+from crawl_metrics import CrawlMetrics, browser_usage
+from crawl_scheduler import CrawlScheduler
+from google_jobs_scraper import run
+from mock_server import serve_captures
+from ndjson_sink import NdjsonSink
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+async def sample_browser_rss(peak: dict, interval: float = 0.5) -> None:
+    """The `sample_browser_rss` coroutine keeps the highest browser RSS seen in `peak` until cancelled."""
+    while True:
+        usage = browser_usage()
+        if usage is not None:
+            peak["rss_mb"] = max(peak.get("rss_mb", 0.0), usage["rss_mb"])
+        await asyncio.sleep(interval)
+
+
+async def benchmark_engine(  # pylint: disable=too-many-locals
+    engine: str,
+    preset: str,
+    queries: list[str],
+    *,
+    search_url: str,
+    concurrency: int,
+    extraction: str,
+) -> dict:
+    """The `benchmark_engine` function crawls every query once with one engine and returns its figures.
+
+    Parameters
+    ----------
+    engine : str
+        The `engine` parameter is one of `ENGINES`.
+    preset : str
+        The `preset` parameter is a key of `LAUNCH_PRESETS`.
+    queries : list[str]
+        The `queries` parameter holds the recorded queries to crawl.
+    search_url : str
+        The `search_url` parameter is the search endpoint of the capture server.
+    concurrency : int
+        The `concurrency` parameter is the number of contexts crawling at the same time.
+    extraction : str
+        The `extraction` parameter is the extraction mode passed to `run`.
+
+    Returns
+    -------
+        A dictionary with the results of the engine.
+
+    """
+    metrics = CrawlMetrics()
+    server_origin = search_url.rsplit("/", 1)[0]
+
+    async def local_only(context: BrowserContext) -> None:
+        # Captured pages still link to Google assets, which would make the timings depend on the network
+        await context.route(
+            lambda url: not url.startswith(server_origin),
+            lambda route: route.abort("blockedbyclient"),
+        )
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        sink = NdjsonSink(str(Path(tmp_dir).joinpath("jobs.ndjson")))
+
+        async def handle_task(context: BrowserContext, term: str, city: str) -> int:
+            return await run(
+                context,
+                sink,
+                max_scroll=0,
+                query=f"{term} in {city}",
+                city=city,
+                extraction=extraction,
+                metrics=metrics,
+                base_url=search_url,
+            )
+
+        peak = {}
+        async with sink, async_playwright() as playwright:
+            cpu_start = time.process_time()
+            with metrics.phase("launch"):
+                browser = await launch_browser(playwright, engine, preset)
+            sampler = asyncio.create_task(sample_browser_rss(peak))
+            try:
+                scheduler = CrawlScheduler(
+                    browser,
+                    handler=handle_task,
+                    concurrency=concurrency,
+                    context_setup=local_only,
+                )
+                start = time.perf_counter()
+                await scheduler.run(tuple(query.rsplit(" in ", 1)) for query in queries)
+                elapsed = time.perf_counter() - start
+                usage = browser_usage() or {}
+            finally:
+                sampler.cancel()
+                await browser.close()
+            cpu_seconds = time.process_time() - cpu_start
+
+    summary = metrics.summary()
+    phases = summary["phases"]
+    cpu_seconds += usage.get("cpu_seconds", 0.0)
+    contexts = min(concurrency, len(queries))
+    return {
+        "engine": engine,
+        "preset": preset,
+        "pages": summary["cities"],
+        "failed": len(scheduler.failed),
+        "jobs": summary["jobs"],
+        "seconds": round(elapsed, 2),
+        "launch_seconds": phases.get("launch", {}).get("sum"),
+        "page_ready_p50": phases.get("time_to_first_card", {}).get("p50"),
+        "page_ready_p95": phases.get("time_to_first_card", {}).get("p95"),
+        "extraction_p50": phases.get("parse", {}).get("p50"),
+        "extraction_p95": phases.get("parse", {}).get("p95"),
+        "browser_peak_rss_mb": peak.get("rss_mb"),
+        "rss_per_context_mb": (
+            round(peak["rss_mb"] / contexts, 1) if peak.get("rss_mb") else None
+        ),
+        "cpu_seconds": round(cpu_seconds, 2),
+        "jobs_per_core_hour": (
+            round(summary["jobs"] / cpu_seconds * 3600) if cpu_seconds else None
+        ),
+    }
+
+
+def parse_args():
+    """The `parse_args` function parses the capture directory and the engines to compare."""
+    parser = argparse.ArgumentParser()
+    parser.add_argument("directory", help="Capture directory written by --record")
+    parser.add_argument(
+        "--engines",
+        nargs="+",
+        default=list(ENGINES),
+        choices=ENGINES,
+        help="Engines to benchmark",
+    )
+    parser.add_argument(
+        "--launch_preset",
+        default="low-memory",
+        choices=sorted(LAUNCH_PRESETS),
+        help="Launch options applied to every engine",
+    )
+    parser.add_argument(
+        "--concurrency", default=4, type=int, help="Contexts crawling at once"
+    )
+    parser.add_argument(
+        "--extraction",
+        default="batched",
+        choices=["batched", "locator", "html"],
+        help="Extraction mode of the crawl",
+    )
+    parser.add_argument(
+        "--output", help="JSON file to write the results of every engine to"
+    )
+    return parser.parse_args()
+
+
+async def main() -> None:
+    """The `main` function benchmarks every engine against the same captures and prints the results."""
+    args = parse_args()
+    results = []
+    with serve_captures(args.directory) as server:
+        queries = sorted(server.manifest)
+        logger.info(f"Benchmarking {len(queries)} pages served at {server.search_url}")
+        for engine in args.engines:
+            try:
+                result = await benchmark_engine(
+                    engine,
+                    args.launch_preset,
+                    queries,
+                    search_url=server.search_url,
+                    concurrency=args.concurrency,
+                    extraction=args.extraction,
+                )
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                # An engine that is not installed must not hide the results of the others
+                logger.error(f"{engine} failed: {e}")
+                continue
+            logger.info(f"{engine}: {result}")
+            results.append(result)
+
+    columns = [
+        "engine",
+        "jobs",
+        "page_ready_p50",
+        "extraction_p50",
+        "rss_per_context_mb",
+        "jobs_per_core_hour",
+    ]
+    print(" | ".join(columns))
+    for result in results:
+        print(" | ".join(str(result[column]) for column in columns))
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=4), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,155 @@
+"""fetchers.py defines how the HTML of a Google jobs results page is obtained for the `html` extraction.
+
+A `Fetcher` returns the HTML of the results page of a query together with its number of job cards, and
+`run` parses that HTML with `parse_listing_html`. The browser based `PlaywrightFetcher` lives next to the
+scrolling code in `google_jobs_scraper.py`. `HttpFetcher` gets the page with a pooled async HTTP client
+instead, without running any of the page's JavaScript, which costs a fraction of a browser page as long
+as the jobs are part of the served HTML. Point it at `mock_server.py` to run it against recorded pages.
+"""
+
+from __future__ import annotations
+
+import abc
+import logging
+from urllib.parse import quote
+
+import httpx
+
+from crawl_metrics import CrawlMetrics
+from html_backend import count_job_cards
+from page_capture import PageRecorder
+
+logger = logging.getLogger(__name__)
+
+GOOGLE_SEARCH_URL = "https://www.google.com/search"
+
+# Google serves a stripped page to clients that do not look like a browser
+default_headers = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:118.0) "
+    "Gecko/20100101 Firefox/118.0",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "en-US,en;q=0.5",
+}
+
+
+def search_url(query: str, base_url: str = GOOGLE_SEARCH_URL) -> str:
+    """The `search_url` function returns the URL of the Google jobs results page of `query`."""
+    return f"{base_url}?hl=en&q={quote(query)}&ibp=htl;jobs"
+
+
+class Fetcher(abc.ABC):
+    """The `Fetcher` class is the interface of the backends loading the results page of a query."""
+
+    @abc.abstractmethod
+    async def fetch(
+        self, context, query: str, metrics: CrawlMetrics | None = None
+    ) -> tuple[str, int]:
+        """The `fetch` method returns the HTML of the results page of `query` and its number of job cards.
+
+        Parameters
+        ----------
+        context : object
+            The `context` parameter is the context of the worker running the query, as created by the
+        `new_context` method of the object the `CrawlScheduler` was given.
+        query : str
+            The `query` parameter is the Google search to fetch.
+        metrics : CrawlMetrics | None
+            The `metrics` parameter, when given, collects the latency of the fetch.
+
+        Returns
+        -------
+            The HTML of the page and the number of job cards on it, `("", 0)` when there are no jobs.
+
+        """
+
+
+class HttpSession:
+    """The `HttpSession` class is the per-worker context of `HttpFetcher`, all sessions share one client."""
+
+    async def close(self) -> None:
+        """The `close` method does nothing, the connection pool is closed with the fetcher."""
+
+
+class HttpFetcher(Fetcher):
+    """The `HttpFetcher` class downloads results pages with one pooled `httpx.AsyncClient`.
+
+    Connections are kept alive and shared by all workers, negotiated as HTTP/2 where the server offers it,
+    and capped at `max_connections`. The fetcher has the `new_context` and `close` coroutines the
+    `CrawlScheduler` expects from a browser, so it can stand in for one.
+
+    Parameters
+    ----------
+    base_url : str
+        The `base_url` parameter is the search endpoint, `GOOGLE_SEARCH_URL` or a `mock_server.py` URL.
+    max_connections : int
+        The `max_connections` parameter is the largest number of connections open at the same time.
+    timeout : float
+        The `timeout` parameter is the number of seconds a request may take.
+    http2 : bool
+        The `http2` parameter enables HTTP/2 on servers that support it.
+    recorder : PageRecorder | None
+        The `recorder` parameter, when given, saves every fetched page so it can be served again later.
+
+    """
+
+    def __init__(
+        self,
+        base_url: str = GOOGLE_SEARCH_URL,
+        *,
+        max_connections: int = 10,
+        timeout: float = 30.0,
+        http2: bool = True,
+        recorder: PageRecorder | None = None,
+    ) -> None:
+        self.base_url = base_url
+        self.recorder = recorder
+        self.requests = 0
+        self.bytes_received = 0
+        self.client = httpx.AsyncClient(
+            http2=http2,
+            headers=default_headers,
+            timeout=timeout,
+            follow_redirects=True,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+            ),
+        )
+
+    async def new_context(self, **_options) -> HttpSession:
+        """The `new_context` method returns a session for one worker, the browser context options are
+        ignored.
+
+        """
+        return HttpSession()
+
+    async def close(self) -> None:
+        """The `close` method closes every pooled connection."""
+        await self.client.aclose()
+
+    async def fetch(
+        self, context, query: str, metrics: CrawlMetrics | None = None
+    ) -> tuple[str, int]:
+        metrics = metrics or CrawlMetrics()
+        try:
+            with metrics.phase("http_get"):
+                response = await self.client.get(search_url(query, self.base_url))
+        except httpx.TimeoutException:
+            metrics.timeout("http_get")
+            raise
+        response.raise_for_status()
+
+        self.requests += 1
+        self.bytes_received += len(response.content)
+        if self.recorder is not None:
+            self.recorder.save_html(response.text, query)
+
+        jobs_count = count_job_cards(response.text)
+        logger.debug(
+            f"Fetched `{query}` over {response.http_version}: {jobs_count} job cards"
+        )
+        return response.text if jobs_count else "", jobs_count
+
+    def summary(self) -> dict:
+        """The `summary` method returns the number of requests made and bytes received."""
+        return {"requests": self.requests, "bytes_received": self.bytes_received}
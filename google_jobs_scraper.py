@@ -1,19 +1,20 @@
 """
-This module is a web scraper that uses Playwright to search for job listings related to a given term in multiple US cities on Google.
-It then extracts job details from the listings, saves the data to a JSON file, and processes the keywords to calculate their frequency and save the results in a summary file. 
+This module is a web scraper that uses Playwright to search for job listings related to given terms in multiple cities on Google.
+It then extracts job details from the listings, streams the data to an NDJSON file, and processes the keywords to calculate their frequency and save the results in a summary file. 
 
 The module imports several Python libraries, including `argparse`, `asyncio`, `collections`, `datetime`, `json`, `logging`, `pathlib`, `quote` from `urllib.parse`, `Locator`, `Page`, `Playwright`, and `async_playwright` from `playwright.async_api`, and `tqdm`. 
 
 The module defines several functions, including:
 - `strip_non_computer_word`: Filters out non-computer science terms from a list of tokens.
 - `process_keyword`: Calculates the frequency of keywords in a JSON file containing job descriptions and highlights.
-- `save_data`: Saves data to a JSON file.
+- `build_record`: Builds the record saved for one job.
 - `clean_data`: Cleans data by removing extra whitespace and joining strings with a "|" separator.
-- `extract_data`: Extracts job data from a web page using XPath locators and saves it in a dictionary format.
-- `parse_listing_page`: Parses a listing page to extract job details.
-- `run`: Opens a browser, navigates to a Google search page for job listings, scrolls down the page, parses the listings, saves the data, and processes the keywords.
+- `extract_data`: Extracts job data from a web page using XPath locators and returns it in a dictionary format.
+- `parse_listing_page`: Yields the job records of a listing page, by default read in batched `page.evaluate` round trips.
+- `parse_listing_html`: Yields the job records parsed from the HTML of a listing page with lxml in a worker process once the page is closed.
+- `run`: Opens a page in a pooled browser context, navigates to a Google search page for job listings, scrolls down the page, parses the listings, saves the data, and processes the keywords.
 - `parse_args`: Parses command line arguments.
-- `main`: Runs the program.
+- `main`: Runs the program, crawling the cities concurrently through a `CrawlScheduler`.
 
 These functions are used to perform various tasks, such as filtering out non-computer science terms from a list of tokens,
 calculating the frequency of keywords in a JSON file containing job descriptions and highlights, 
@@ -23,22 +24,52 @@ parsing a listing page to extract job details, opening a browser,
 navigating to a Google search page for job listings, scrolling down the page, parsing the listings, saving the data, 
 and processing the keywords, and parsing command line arguments. 
 
-The module also defines several variables, including `logger`, `output_dir`, `dt`, `json_file_path`, `summary_file_path`, and `data`, which are used to store and manipulate data throughout the program.
+The module also defines several variables, including `logger`, `output_dir`, `dt`, `json_file_path`, and `summary_file_path`, which are used to store and manipulate data throughout the program.
 """
 
+from __future__ import annotations
+
 import argparse
 import asyncio
+from collections.abc import AsyncIterator, Callable, Iterable, Iterator
+from concurrent.futures import Executor, ProcessPoolExecutor
+import contextlib
 import datetime
-import json
+import functools
 import logging
+import os
 from pathlib import Path
+import socket
+import tempfile
 import time
-from urllib.parse import quote
 
-from playwright.async_api import Locator, Page, Playwright, async_playwright
+from playwright.async_api import BrowserContext, Locator, Page, async_playwright
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
 from tqdm import tqdm
 
-from keyword_const import US_CITIES
+from adaptive_concurrency import AdaptiveController
+from browser_engines import ENGINES, LAUNCH_PRESETS, launch_browser
+from crawl_metrics import CrawlMetrics
+from crawl_scheduler import CrawlScheduler
+from crawl_state import CrawlJournal
+from dedupe import Deduplicator, FingerprintSet, job_fingerprint
+from fetchers import GOOGLE_SEARCH_URL, Fetcher, HttpFetcher, search_url
+from html_backend import parse_jobs_html
+from job_index import SEEN, UPDATED, JobIndex, listing_key
+from ndjson_sink import NdjsonSink
+from page_capture import PageRecorder, PageReplayer
+from recycling import RecyclePolicy
+from resource_blocking import BLOCKING_PROFILES, ResourceBlocker
+from storage_state import StorageState
+from task_matrix import (
+    LOCATION_SETS,
+    build_task_matrix,
+    parse_shard,
+    read_lines,
+    resolve_locations,
+    select_shard,
+)
+from task_queue import TaskQueue
 
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
@@ -47,17 +78,105 @@ logger = logging.getLogger(__name__)
 output_dir = Path.cwd().joinpath("output")
 output_dir.mkdir(exist_ok=True)
 dt = datetime.datetime.now().strftime("%Y%m%d%H%M%S")
-json_file_path = str(output_dir.joinpath(f"google_jobs_data_{dt}.json"))
+json_file_path = str(output_dir.joinpath(f"google_jobs_data_{dt}.ndjson"))
+sightings_file_path = str(output_dir.joinpath(f"google_jobs_sightings_{dt}.ndjson"))
+metrics_file_path = str(output_dir.joinpath(f"google_jobs_metrics_{dt}.json"))
 
 logger.debug(f"Writing data into '{json_file_path}'")
 
-data = []
+# CSS twin of the `gws-plugins-horizon-jobs__tl-lif` XPath, counted inside the page while scrolling
+css_jobs_tabs = "div.gws-plugins-horizon-jobs__tl-lif"
+# seconds to wait for the first job card before treating the city as empty
+first_card_timeout = 15.0
+
+js_helpers = """
+    const clean = (text) => text.split(/\\s+/).filter(Boolean).join(" ");
+    const innerText = (root, selector) => {
+        const element = root.querySelector(selector);
+        return element ? clean(element.innerText) : "";
+    };
+    const allInnerTexts = (root, selector) =>
+        Array.from(root.querySelectorAll(selector), (e) => clean(e.innerText)).join(" | ");
+    const details = document.querySelectorAll(
+        'div[id="gws-plugins-horizon-jobs__job_details_page"]'
+    );
+"""
+
+# Browser side twin of `extract_data` + `clean_data`: walks the job details panes at the given
+# indices in one round trip and returns the records already whitespace-normalized.
+extract_jobs_js = "(indices) => {" + js_helpers + """
+    return indices.map((i) => details[i]).map((job) => ({
+        title: innerText(job, 'h2[class="KLsYvd"]'),
+        employer: innerText(job, 'div[class*="nJlQNd"]'),
+        job_description: allInnerTexts(job, 'span[class="HBvzbc"]'),
+        job_highlights: allInnerTexts(job, 'div[class="JxVj3d"] div[class="IiQJ2c"]'),
+    }));
+}
+"""
 
+# Cheap first pass of incremental crawls: only the listing identity and a hash of the listing
+# content cross the Playwright boundary, the description itself stays in the browser.
+index_jobs_js = "(jobsCount) => {" + js_helpers + """
+    const cards = document.querySelectorAll('div[class="gws-plugins-horizon-jobs__tl-lif"]');
+    const listingId = (root) => {
+        if (!root) return null;
+        const tagged = root.querySelector("[data-encoded-doc-id], [data-docid]");
+        if (tagged) {
+            return tagged.getAttribute("data-encoded-doc-id") || tagged.getAttribute("data-docid");
+        }
+        const shared = root.querySelector("[data-share-url]");
+        const match = shared && /htidocid=([^&]+)/.exec(shared.getAttribute("data-share-url"));
+        return match ? decodeURIComponent(match[1]) : null;
+    };
+    const fnv1a = (text) => {
+        let hash = 0x811c9dc5;
+        for (let i = 0; i < text.length; i++) {
+            hash = Math.imul(hash ^ text.charCodeAt(i), 0x01000193) >>> 0;
+        }
+        return hash.toString(16);
+    };
+    return Array.from(details).slice(0, jobsCount).map((job, i) => ({
+        listing_id: listingId(cards[i]) || listingId(job),
+        title: innerText(job, 'h2[class="KLsYvd"]'),
+        employer: innerText(job, 'div[class*="nJlQNd"]'),
+        content_hash: fnv1a(
+            allInnerTexts(job, 'span[class="HBvzbc"]') + " | " +
+            allInnerTexts(job, 'div[class="JxVj3d"] div[class="IiQJ2c"]')
+        ),
+    }));
+}
+"""
 
-def save_data() -> None:
-    """The `save_data` function saves the `data` variable to a JSON file specified by `json_file_path`."""
-    with open(json_file_path, "w", encoding="utf-8") as outfile:
-        json.dump(data, outfile, indent=4)
+
+def build_record(
+    job: dict, fingerprint: str, city: str, query: str, annotations: dict | None
+) -> dict:
+    """The `build_record` function returns the record saved for one job.
+
+    Parameters
+    ----------
+    job : dict
+        The `job` parameter has the cleaned `title`, `employer`, `job_description` and `job_highlights`.
+    fingerprint : str
+        The `fingerprint` parameter is the `job_fingerprint` of the job.
+    city : str
+        The `city` parameter is the city the job was found in.
+    query : str
+        The `query` parameter is the Google search the job was found with.
+    annotations : dict | None
+        The `annotations` parameter holds extra fields saved with the job.
+
+    """
+    return {
+        "title": job["title"],
+        "employer": job["employer"],
+        "job_description": job["job_description"],
+        "job_highlights": job["job_highlights"],
+        "fingerprint": fingerprint,
+        "city": city,
+        "query": query,
+        **(annotations or {}),
+    }
 
 
 def clean_data(dirty_data: str or list) -> str:
@@ -89,15 +208,35 @@ def clean_data(dirty_data: str or list) -> str:
     return dirty_data
 
 
-async def extract_data(job_element: Locator) -> None:
-    """The function `extract_data` extracts job data from a web page using XPath locators and saves it in a
-    dictionary format.
+async def extract_data(
+    job_element: Locator,
+    city: str,
+    query: str,
+    dedupe: Deduplicator | None = None,
+    annotations: dict | None = None,
+) -> dict | None:
+    """The function `extract_data` extracts job data from a web page using XPath locators and returns it in
+    a dictionary format.
 
     Parameters
     ----------
     job_element : Locator
         The `job_element` parameter is a Locator object that represents a specific job element on a
     webpage. It is used to extract data from that element.
+    city : str
+        The `city` parameter is the city the job was found in, saved along with the job.
+    query : str
+        The `query` parameter is the Google search the job was found with, saved along with the job.
+    dedupe : Deduplicator | None
+        The `dedupe` parameter, when given, is checked with the job fingerprint before the highlights are
+    read, so a posting already scraped under another query costs no further round trips.
+    annotations : dict | None
+        The `annotations` parameter holds extra fields saved with the job, such as its incremental
+    crawl `status`.
+
+    Returns
+    -------
+        The record of the job, or None if `dedupe` found it to be a duplicate.
 
     """
     xpath_title = "//h2[@class='KLsYvd']"
@@ -111,6 +250,16 @@ async def extract_data(job_element: Locator) -> None:
         xpath_job_description_span
     ).all_inner_texts()
 
+    title = clean_data(title)
+    job_description = clean_data(job_description)
+    employer = clean_data(employer)
+
+    fingerprint = job_fingerprint(title, employer, job_description)
+    if dedupe is not None and not dedupe.check(
+        fingerprint, city, query, revision=revision_of(annotations)
+    ):
+        return None
+
     highlights_elements = job_element.locator(xpath_job_highlights)
     highlights_count = await highlights_elements.count()
     all_text_highlights = []
@@ -121,31 +270,153 @@ async def extract_data(job_element: Locator) -> None:
             .all_inner_texts()
         )
 
-    title = clean_data(title)
-    job_description = clean_data(job_description)
     highlights = clean_data(all_text_highlights)
-    employer = clean_data(employer)
 
-    data_to_save = {
+    job = {
         "title": title,
         "employer": employer,
         "job_description": job_description,
         "job_highlights": highlights,
     }
+    return build_record(job, fingerprint, city, query, annotations)
+
+
+def select_listings(
+    listings: list[dict],
+    city: str,
+    query: str,
+    job_index: JobIndex,
+    dedupe: Deduplicator | None = None,
+) -> tuple[dict[int, dict], list[tuple[str, str]]]:
+    """The `select_listings` function picks the listings an incremental crawl has to extract.
+
+    Parameters
+    ----------
+    listings : list[dict]
+        The `listings` parameter holds the `listing_id`, `title`, `employer` and `content_hash` of every
+    listing of the page, in page order.
+    city : str
+        The `city` parameter is the city the listing page was searched for.
+    query : str
+        The `query` parameter is the Google search that produced the listing page.
+    job_index : JobIndex
+        The `job_index` parameter classifies every listing as `new`, `seen` or `updated`.
+    dedupe : Deduplicator | None
+        The `dedupe` parameter, when given, records the `seen` listings as sightings.
+
+    Returns
+    -------
+        A dictionary mapping the page index of every `new` or `updated` listing to the `listing_key`,
+    `status` and `content_hash` saved with it, and the `(key, content_hash)` entries to store in `job_index` once the task
+    is done.
+
+    """
+    selected = {}
+    index_entries = []
+    for i, listing in enumerate(listings):
+        key = listing_key(listing["listing_id"], listing["title"], listing["employer"])
+        status = job_index.classify(key, listing["content_hash"])
+        index_entries.append((key, listing["content_hash"]))
+        if status == SEEN:
+            if dedupe is not None:
+                dedupe.record_seen(key, city, query)
+            continue
+        selected[i] = {
+            "listing_key": key,
+            "status": status,
+            "content_hash": listing["content_hash"],
+        }
+
+    logger.debug(f"Extract {len(selected)} new or updated jobs of {len(listings)}")
+    return selected, index_entries
+
+
+def revision_of(annotations: dict | None) -> str | None:
+    """The `revision_of` function returns the content hash an `updated` listing is deduplicated under,
+    or None for any other listing.
+
+    """
+    if annotations and annotations.get("status") == UPDATED:
+        return annotations["content_hash"]
+    return None
+
+
+def iter_records(
+    jobs: Iterable[tuple[dict, dict]],
+    city: str,
+    query: str,
+    dedupe: Deduplicator | None = None,
+) -> Iterator[dict]:
+    """The `iter_records` function yields the records of already extracted jobs, skipping duplicate
+    postings.
+
+    Parameters
+    ----------
+    jobs : Iterable[tuple[dict, dict]]
+        The `jobs` parameter holds `(job, annotations)` pairs, where `job` has the cleaned `title`,
+    `employer`, `job_description` and `job_highlights` and `annotations` extra fields to save with it.
+    city : str
+        The `city` parameter is the city the jobs were found in.
+    query : str
+        The `query` parameter is the Google search the jobs were found with.
+    dedupe : Deduplicator | None
+        The `dedupe` parameter, when given, drops postings already scraped under another query.
+
+    """
+    for job, annotations in jobs:
+        fingerprint = job_fingerprint(
+            job["title"], job["employer"], job["job_description"]
+        )
+        if dedupe is None or dedupe.check(
+            fingerprint, city, query, revision=revision_of(annotations)
+        ):
+            yield build_record(job, fingerprint, city, query, annotations)
 
-    data.append(data_to_save)
 
+async def parse_listing_page(  # pylint: disable=too-many-locals
+    page: Page,
+    city: str,
+    query: str,
+    *,
+    extraction: str = "batched",
+    dedupe: Deduplicator | None = None,
+    job_index: JobIndex | None = None,
+    metrics: CrawlMetrics | None = None,
+    batch_size: int = 100,
+) -> AsyncIterator[dict]:
+    """The `parse_listing_page` async generator parses a listing page and yields the record of every job.
 
-async def parse_listing_page(page: Page) -> None:
-    """The `parse_listing_page` function parses a listing page to extract job details.
+    Records are produced batch by batch while the caller writes them out, so no more than `batch_size`
+    extracted jobs of the page are held in memory at once.
 
     Parameters
     ----------
     page : Page
         The `page` parameter is an instance of the `Page` class. It represents a web page that you want to
     parse.
+    city : str
+        The `city` parameter is the city the listing page was searched for.
+    query : str
+        The `query` parameter is the Google search that produced the listing page.
+    extraction : str
+        The `extraction` parameter selects the extraction mode. With `batched`, the details of up to
+    `batch_size` jobs are read with one `page.evaluate` call running `extract_jobs_js` in the browser. With
+    `locator`, every job is read field by field through `extract_data`, which costs several Playwright
+    round trips per job.
+    dedupe : Deduplicator | None
+        The `dedupe` parameter, when given, drops postings already scraped under another query and records
+    them as sightings instead.
+    job_index : JobIndex | None
+        The `job_index` parameter, when given, turns on incremental crawling. Every listing is first
+    classified from its identity and content hash alone, and only `new` or `updated` listings are fully
+    extracted. Listings `seen` unchanged in an earlier crawl are only recorded as sightings.
+    metrics : CrawlMetrics | None
+        The `metrics` parameter, when given, collects the time spent indexing and extracting the jobs.
+    batch_size : int
+        The `batch_size` parameter is the number of jobs read per `page.evaluate` call.
 
     """
+    metrics = metrics or CrawlMetrics()
     xpath_jobs_tabs = "//div[@class='gws-plugins-horizon-jobs__tl-lif']"
 
     try:
@@ -159,64 +430,443 @@ async def parse_listing_page(page: Page) -> None:
     jobs_count = await jobs.count()
     logger.debug(f"Parse {jobs_count} jobs")
 
-    xpath_job_detail = "//div[@id='gws-plugins-horizon-jobs__job_details_page']"
-    job_details = page.locator(xpath_job_detail)
-    for i in range(jobs_count):
-        job_element = job_details.nth(i)
-        await extract_data(job_element)
+    selected = {i: {} for i in range(jobs_count)}
+    if job_index is not None:
+        with metrics.phase("index"):
+            listings = await page.evaluate(index_jobs_js, jobs_count)
+        selected, index_entries = select_listings(
+            listings, city, query, job_index, dedupe=dedupe
+        )
+    indices = list(selected)
 
+    if extraction == "batched":
+        for start in range(0, len(indices), batch_size):
+            batch = indices[start : start + batch_size]
+            with metrics.phase("extract_batch"):
+                jobs_data = await page.evaluate(extract_jobs_js, batch)
+            jobs = [(job, selected[i]) for i, job in zip(batch, jobs_data)]
+            for record in iter_records(jobs, city, query, dedupe=dedupe):
+                yield record
+    else:
+        xpath_job_detail = "//div[@id='gws-plugins-horizon-jobs__job_details_page']"
+        job_details = page.locator(xpath_job_detail)
+        for i in indices:
+            job_element = job_details.nth(i)
+            with metrics.phase("extract_job"):
+                record = await extract_data(
+                    job_element, city, query, dedupe=dedupe, annotations=selected[i]
+                )
+            if record is not None:
+                yield record
 
-async def run(playwright: Playwright, max_scroll: int, query: str) -> None:
-    """The function opens a browser, navigates to a Google search page for job listings, scrolls down the
-    page, parses the listings, saves the data, and processes the keyword.
+    if job_index is not None:
+        job_index.stage(query, index_entries)
+
+
+async def parse_listing_html(
+    page_html: str,
+    city: str,
+    query: str,
+    executor: Executor,
+    *,
+    dedupe: Deduplicator | None = None,
+    job_index: JobIndex | None = None,
+) -> AsyncIterator[dict]:
+    """The `parse_listing_html` async generator extracts job details from the HTML of a scrolled listing
+    page and yields the record of every job.
+
+    The HTML is parsed by `parse_jobs_html` in `executor`, so the page can be closed before parsing and
+    the CPU-bound work is spread over the executor workers instead of blocking the event loop.
 
     Parameters
     ----------
-    playwright : Playwright
-        The `playwright` parameter is an instance of the Playwright class, which is used to control the
-    browser and perform actions on web pages.
-    max_scroll : int
-        The `max_scroll` parameter determines the maximum number of times the page will be scrolled down to
-    load more content. It is an integer value that specifies the number of scroll actions to perform.
+    page_html : str
+        The `page_html` parameter is the HTML of the listing page, as returned by `page.content()`.
+    city : str
+        The `city` parameter is the city the listing page was searched for.
     query : str
-        The `query` parameter is a string that represents the search query to be used on Google. It is used
-    to search for job listings related to the query.
+        The `query` parameter is the Google search that produced the listing page.
+    executor : Executor
+        The `executor` parameter is the process or thread pool `parse_jobs_html` runs in.
+    dedupe : Deduplicator | None
+        The `dedupe` parameter, when given, drops postings already scraped under another query.
+    job_index : JobIndex | None
+        The `job_index` parameter, when given, only keeps the `new` or `updated` listings.
+
+    """
+    loop = asyncio.get_running_loop()
+    jobs_data = await loop.run_in_executor(executor, parse_jobs_html, page_html)
+    logger.debug(f"Parse {len(jobs_data)} jobs")
+
+    selected = {i: {} for i in range(len(jobs_data))}
+    if job_index is not None:
+        selected, index_entries = select_listings(
+            jobs_data, city, query, job_index, dedupe=dedupe
+        )
+
+    jobs = ((jobs_data[i], annotations) for i, annotations in selected.items())
+    for record in iter_records(jobs, city, query, dedupe=dedupe):
+        yield record
+
+    if job_index is not None:
+        job_index.stage(query, index_entries)
+
+
+async def scroll_job_list(
+    page: Page,
+    max_scroll: int,
+    *,
+    plateau_timeout: float,
+    time_budget: float,
+    metrics: CrawlMetrics | None = None,
+    navigation_start: float | None = None,
+) -> int:
+    """The `scroll_job_list` function scrolls the job list until no new job cards are loaded.
+
+    Instead of sleeping a fixed amount after every wheel step, it waits in the browser for the number of
+    `gws-plugins-horizon-jobs__tl-lif` cards to grow. The list is considered complete as soon as one
+    scroll step does not add a card within `plateau_timeout`, or when `time_budget` runs out.
+
+    Parameters
+    ----------
+    page : Page
+        The `page` parameter is the Google jobs results page to scroll.
+    max_scroll : int
+        The `max_scroll` parameter is the maximum number of scroll steps to perform.
+    plateau_timeout : float
+        The `plateau_timeout` parameter is the number of seconds to wait for new cards after a scroll step
+    before the list is considered fully loaded.
+    time_budget : float
+        The `time_budget` parameter is the hard limit, in seconds, for loading the whole list of a city.
+    metrics : CrawlMetrics | None
+        The `metrics` parameter, when given, collects the wait for the first card, every scroll step, the
+    steps used and the timeouts hit.
+    navigation_start : float | None
+        The `navigation_start` parameter is the `time.perf_counter()` value taken before `page.goto`. When
+    given, the time from there to the first job card is recorded as `time_to_first_card`.
+
+    Returns
+    -------
+        The number of job cards loaded on the page, 0 when no job card appeared at all.
 
     """
-    # Initializing browser and opening a new page
-    browser = await playwright.firefox.launch(headless=True)
-    context = await browser.new_context()
-    page = await context.new_page()
+    metrics = metrics or CrawlMetrics()
+    deadline = time.monotonic() + time_budget
+
+    def remaining_ms(limit: float) -> float:
+        # Playwright treats a timeout of 0 as "wait forever", so callers must check for it
+        return max(0.0, min(limit, deadline - time.monotonic()) * 1000)
 
-    url = f"https://www.google.com/search?hl=en&q={quote(query)}&ibp=htl;jobs"
-    await page.goto(url, wait_until="domcontentloaded")
+    try:
+        with metrics.phase("first_card"):
+            await page.wait_for_selector(
+                css_jobs_tabs, timeout=remaining_ms(first_card_timeout) or 1
+            )
+    except PlaywrightTimeoutError:
+        # No job card ever showed up, most likely because there are no jobs for the query
+        metrics.timeout("first_card")
+        return 0
+    if navigation_start is not None:
+        metrics.observe("time_to_first_card", time.perf_counter() - navigation_start)
 
-    await page.wait_for_timeout(2000)
-    await asyncio.sleep(5)
+    count_js = "(selector) => document.querySelectorAll(selector).length"
+    grew_js = (
+        "([selector, count]) => document.querySelectorAll(selector).length > count"
+    )
 
     job_tree = page.locator("//div[@role='tree']")
     await job_tree.click()
-    previousYBound = 0
+    jobs_count = await page.evaluate(count_js, css_jobs_tabs)
 
+    steps = 0
     for _ in tqdm(range(max_scroll), desc="Scroll"):
-        await page.mouse.wheel(0, 5000)
-        await asyncio.sleep(2)
-        box3 = await job_tree.bounding_box()
-        if previousYBound == box3["y"]:
+        timeout = remaining_ms(plateau_timeout)
+        if not timeout:
+            logger.debug(f"Scroll time budget of {time_budget}s exhausted")
+            metrics.timeout("time_budget")
             break
-        previousYBound = box3["y"]
 
-    await parse_listing_page(page)
-    logger.debug(f"Finished Parsing `{query}`")
-    save_data()
+        steps += 1
+        try:
+            with metrics.phase("scroll_step"):
+                await page.mouse.wheel(0, 5000)
+                await page.wait_for_function(
+                    grew_js, arg=[css_jobs_tabs, jobs_count], timeout=timeout
+                )
+        except PlaywrightTimeoutError:
+            metrics.timeout("plateau")
+            break
+        jobs_count = await page.evaluate(count_js, css_jobs_tabs)
+
+    metrics.record_scroll(steps, max_scroll)
+    return jobs_count
+
+
+async def load_results_page(
+    page: Page,
+    query: str,
+    max_scroll: int,
+    *,
+    plateau_timeout: float = 3.0,
+    time_budget: float = 120.0,
+    metrics: CrawlMetrics | None = None,
+    recorder: PageRecorder | None = None,
+    base_url: str = GOOGLE_SEARCH_URL,
+) -> int:
+    """The `load_results_page` function navigates `page` to the results of `query` and scrolls the job list.
+
+    Parameters
+    ----------
+    page : Page
+        The `page` parameter is the page to load the results into.
+    query : str
+        The `query` parameter is the Google search to run.
+    max_scroll : int
+        The `max_scroll` parameter is the maximum number of scroll steps to perform.
+    plateau_timeout : float
+        The `plateau_timeout` parameter is the number of seconds a scroll step may take to load new job
+    cards before the list is considered complete.
+    time_budget : float
+        The `time_budget` parameter is the hard limit, in seconds, spent scrolling the list.
+    metrics : CrawlMetrics | None
+        The `metrics` parameter, when given, collects the navigation and scrolling latencies.
+    recorder : PageRecorder | None
+        The `recorder` parameter, when given, saves the HTML of the page once it has been scrolled.
+    base_url : str
+        The `base_url` parameter is the search endpoint, Google or a `mock_server.py` URL.
+
+    Returns
+    -------
+        The number of job cards loaded on the page, 0 when none showed up.
+
+    """
+    metrics = metrics or CrawlMetrics()
+    navigation_start = time.perf_counter()
+    try:
+        with metrics.phase("goto"):
+            await page.goto(search_url(query, base_url), wait_until="domcontentloaded")
+    except PlaywrightTimeoutError:
+        metrics.timeout("goto")
+        raise
+
+    jobs_count = await scroll_job_list(
+        page,
+        max_scroll,
+        plateau_timeout=plateau_timeout,
+        time_budget=time_budget,
+        metrics=metrics,
+        navigation_start=navigation_start,
+    )
+    if recorder is not None:
+        await recorder.save(page, query)
+    return jobs_count
+
+
+class PlaywrightFetcher(Fetcher):
+    """The `PlaywrightFetcher` class loads and scrolls the results page in a browser and returns its HTML.
+
+    Parameters
+    ----------
+    max_scroll : int
+        The `max_scroll` parameter is the maximum number of scroll steps to perform.
+    plateau_timeout : float
+        The `plateau_timeout` parameter is the number of seconds a scroll step may take to load new job
+    cards before the list is considered complete.
+    time_budget : float
+        The `time_budget` parameter is the hard limit, in seconds, spent scrolling the list.
+    recorder : PageRecorder | None
+        The `recorder` parameter, when given, saves the HTML of every scrolled page.
+    base_url : str
+        The `base_url` parameter is the search endpoint, Google or a `mock_server.py` URL.
+
+    """
+
+    def __init__(
+        self,
+        max_scroll: int,
+        *,
+        plateau_timeout: float = 3.0,
+        time_budget: float = 120.0,
+        recorder: PageRecorder | None = None,
+        base_url: str = GOOGLE_SEARCH_URL,
+    ) -> None:
+        self.max_scroll = max_scroll
+        self.plateau_timeout = plateau_timeout
+        self.time_budget = time_budget
+        self.recorder = recorder
+        self.base_url = base_url
+
+    async def fetch(
+        self,
+        context: BrowserContext,
+        query: str,
+        metrics: CrawlMetrics | None = None,
+    ) -> tuple[str, int]:
+        page = await context.new_page()
+        try:
+            jobs_count = await load_results_page(
+                page,
+                query,
+                self.max_scroll,
+                plateau_timeout=self.plateau_timeout,
+                time_budget=self.time_budget,
+                metrics=metrics,
+                recorder=self.recorder,
+                base_url=self.base_url,
+            )
+            page_html = await page.content() if jobs_count else ""
+        finally:
+            await page.close()
+        return page_html, jobs_count
+
+
+async def run(  # pylint: disable=too-many-arguments,too-many-locals
+    context: BrowserContext,
+    sink: NdjsonSink,
+    *,
+    max_scroll: int,
+    query: str,
+    city: str,
+    plateau_timeout: float = 3.0,
+    time_budget: float = 120.0,
+    extraction: str = "batched",
+    dedupe: Deduplicator | None = None,
+    job_index: JobIndex | None = None,
+    recorder: PageRecorder | None = None,
+    executor: Executor | None = None,
+    metrics: CrawlMetrics | None = None,
+    batch_size: int = 100,
+    fetcher: Fetcher | None = None,
+    base_url: str = GOOGLE_SEARCH_URL,
+) -> int:
+    """The function opens a new page in the given browser context, navigates to a Google search page for
+    job listings, scrolls down the page, parses the listings and streams the records to the sink.
+
+    Records go from the extraction straight into `sink`, whose bounded queue makes this function wait
+    whenever too many records are not written yet, so memory does not grow with the number of jobs.
+
+    Parameters
+    ----------
+    context : BrowserContext
+        The `context` parameter is the browser context the page is opened in, or the session of `fetcher`.
+    Contexts are owned by the `CrawlScheduler` pool and are reused between queries, so only the page is
+    closed here.
+    sink : NdjsonSink
+        The `sink` parameter is the NDJSON writer the extracted jobs are streamed to.
+    max_scroll : int
+        The `max_scroll` parameter determines the maximum number of times the page will be scrolled down to
+    load more content. It is an integer value that specifies the number of scroll actions to perform.
+    query : str
+        The `query` parameter is a string that represents the search query to be used on Google. It is used
+    to search for job listings related to the query.
+    city : str
+        The `city` parameter is the city the query searches jobs in.
+    plateau_timeout : float
+        The `plateau_timeout` parameter is the number of seconds a scroll step may take to load new job
+    cards before the list is considered complete.
+    time_budget : float
+        The `time_budget` parameter is the hard limit, in seconds, spent scrolling a single query.
+    extraction : str
+        The `extraction` parameter picks the extraction mode. `batched` and `locator` are handled by
+    `parse_listing_page` on the live page. `html` reads the page HTML once, closes the page and parses the
+    HTML in `executor` with `parse_listing_html`.
+    dedupe : Deduplicator | None
+        The `dedupe` parameter is passed on to `parse_listing_page` to skip already scraped postings.
+    job_index : JobIndex | None
+        The `job_index` parameter is passed on to `parse_listing_page` for incremental crawling.
+    recorder : PageRecorder | None
+        The `recorder` parameter, when given, saves the HTML of the page once it has been scrolled so the
+    query can be replayed offline later.
+    executor : Executor | None
+        The `executor` parameter is the pool used by the `html` extraction mode.
+    metrics : CrawlMetrics | None
+        The `metrics` parameter, when given, collects the latency of every phase of the query and its
+    number of jobs.
+    batch_size : int
+        The `batch_size` parameter is the number of jobs extracted per `page.evaluate` call in `batched`
+    mode.
+    fetcher : Fetcher | None
+        The `fetcher` parameter, when given, gets the HTML of the results page, which is then parsed like
+    in the `html` mode whatever `extraction` says. `html` uses a `PlaywrightFetcher` by default.
+    base_url : str
+        The `base_url` parameter is the search endpoint the browser navigates to, Google or a
+    `mock_server.py` URL.
+
+    Returns
+    -------
+        The number of job cards loaded for the query, 0 when none showed up.
+
+    """
+    metrics = metrics or CrawlMetrics()
+    start = time.perf_counter()
+    if extraction == "html" and fetcher is None:
+        fetcher = PlaywrightFetcher(
+            max_scroll,
+            plateau_timeout=plateau_timeout,
+            time_budget=time_budget,
+            recorder=recorder,
+            base_url=base_url,
+        )
+
+    jobs_saved = 0
+    if fetcher is not None:
+        page_html, jobs_count = await fetcher.fetch(context, query, metrics=metrics)
+        if jobs_count:
+            # The page is already closed, so the context is free while the HTML is parsed
+            with metrics.phase("parse"):
+                async for record in parse_listing_html(
+                    page_html, city, query, executor, dedupe=dedupe, job_index=job_index
+                ):
+                    await sink.put(record)
+                    jobs_saved += 1
+    else:
+        page = await context.new_page()
+        try:
+            jobs_count = await load_results_page(
+                page,
+                query,
+                max_scroll,
+                plateau_timeout=plateau_timeout,
+                time_budget=time_budget,
+                metrics=metrics,
+                recorder=recorder,
+                base_url=base_url,
+            )
+            if jobs_count:
+                with metrics.phase("parse"):
+                    async for record in parse_listing_page(
+                        page,
+                        city,
+                        query,
+                        extraction=extraction,
+                        dedupe=dedupe,
+                        job_index=job_index,
+                        metrics=metrics,
+                        batch_size=batch_size,
+                    ):
+                        await sink.put(record)
+                        jobs_saved += 1
+        finally:
+            await page.close()
+
+    if jobs_count:
+        logger.debug(f"Finished Parsing `{query}`")
+    else:
+        logger.debug(f"No jobs found for `{query}`")
     # process_keyword()
-    await context.close()
-    await browser.close()
+    metrics.record_city(
+        query,
+        city,
+        cards=jobs_count,
+        jobs=jobs_saved,
+        seconds=time.perf_counter() - start,
+    )
+    return jobs_count
 
 
-def parse_args():
-    """The `parse_args` function is used to parse command line arguments, specifically the job term to
-    search and the maximum scrolling count.
+def parse_args():  # pylint: disable=too-many-statements
+    """The `parse_args` function is used to parse command line arguments, specifically the job terms and
+    locations to search and the maximum scrolling count.
 
     Returns
     -------
@@ -224,26 +874,500 @@ def parse_args():
 
     """
     parser = argparse.ArgumentParser()
-    parser.add_argument("term", help="Job term to search")
+    parser.add_argument("terms", nargs="*", help="Job terms to search")
+    parser.add_argument(
+        "--terms_file", help="Text file with one job term to search per line"
+    )
+    parser.add_argument(
+        "--locations",
+        nargs="+",
+        default=["us"],
+        help=f"Location sets to search: {', '.join(LOCATION_SETS)} or a file with one "
+        "location per line",
+    )
     parser.add_argument(
         "--max_scroll", default=100, type=int, help="Maximum scrolling count"
     )
+    parser.add_argument(
+        "--concurrency",
+        default=4,
+        type=int,
+        help="Number of browser contexts crawling cities at the same time",
+    )
+    parser.add_argument(
+        "--adaptive",
+        action="store_true",
+        help="Tune the active contexts (up to --concurrency) and the pacing between "
+        "navigations from latency, error and empty-result rates",
+    )
+    parser.add_argument(
+        "--min_concurrency",
+        default=1,
+        type=int,
+        help="Fewest contexts kept active by --adaptive",
+    )
+    parser.add_argument(
+        "--plateau_timeout",
+        default=3.0,
+        type=float,
+        help="Seconds to wait for new job cards after a scroll before stopping",
+    )
+    parser.add_argument(
+        "--city_budget",
+        default=120.0,
+        type=float,
+        help="Hard limit in seconds for scrolling the job list of one city",
+    )
+    parser.add_argument(
+        "--extraction",
+        default="batched",
+        choices=["batched", "locator", "html"],
+        help="Read all jobs in one page.evaluate call, field by field with locators, "
+        "or parse the page HTML with lxml outside the browser",
+    )
+    parser.add_argument(
+        "--engine",
+        default="firefox",
+        choices=ENGINES,
+        help="Browser engine to crawl with",
+    )
+    parser.add_argument(
+        "--launch_preset",
+        default="default",
+        choices=sorted(LAUNCH_PRESETS),
+        help="Browser launch options, low-memory trims the footprint of every context",
+    )
+    parser.add_argument(
+        "--recycle_pages",
+        default=0,
+        type=int,
+        help="Replace a browser context after this many cities (0 never does)",
+    )
+    parser.add_argument(
+        "--recycle_context_mb",
+        default=0,
+        type=float,
+        help="Replace a context once the browser uses more than this many MB per context",
+    )
+    parser.add_argument(
+        "--recycle_browser_mb",
+        default=0,
+        type=float,
+        help="Relaunch the browser, once its running cities are done, above this many MB",
+    )
+    parser.add_argument(
+        "--recycle_browser_min_pages",
+        default=10,
+        type=int,
+        help="Cities a launched browser runs before it can be relaunched for its memory",
+    )
+    parser.add_argument(
+        "--fetcher",
+        default="playwright",
+        choices=["playwright", "http"],
+        help="Load results pages in Firefox, or download them with a pooled HTTP client without "
+        "running their JavaScript (parsed like --extraction html)",
+    )
+    parser.add_argument(
+        "--search_url",
+        default=GOOGLE_SEARCH_URL,
+        help="Search endpoint to query, e.g. a mock_server.py URL to crawl recorded pages offline",
+    )
+    parser.add_argument(
+        "--max_connections",
+        default=10,
+        type=int,
+        help="Connections kept open by --fetcher http",
+    )
+    parser.add_argument(
+        "--parse_workers",
+        default=os.cpu_count(),
+        type=int,
+        help="Processes parsing page HTML in the html extraction mode",
+    )
+    parser.add_argument(
+        "--fsync_interval",
+        default=5.0,
+        type=float,
+        help="Minimum seconds between two fsync calls on the output file",
+    )
+    parser.add_argument(
+        "--rotate_mb",
+        default=0,
+        type=int,
+        help="Start a new output file once the current one reaches this size, 0 disables",
+    )
+    parser.add_argument(
+        "--fingerprints",
+        default=str(output_dir.joinpath("fingerprints.json")),
+        help="File the fingerprints of scraped jobs are kept in between runs",
+    )
+    parser.add_argument(
+        "--dedupe_max_items",
+        default=1_000_000,
+        type=int,
+        help="Fingerprints kept in an exact set before switching to a Bloom filter",
+    )
+    parser.add_argument(
+        "--block",
+        default="minimal",
+        choices=sorted(BLOCKING_PROFILES),
+        help="Network blocking profile applied to every browser context",
+    )
+    parser.add_argument(
+        "--shard",
+        type=parse_shard,
+        metavar="I/K",
+        help="Only crawl shard I of K (1 <= I <= K) of the tasks, split by a stable hash so K machines "
+        "running the same command cover every task once",
+    )
+    parser.add_argument(
+        "--journal",
+        default=str(output_dir.joinpath("crawl_state.sqlite3")),
+        help="SQLite file recording the progress of every (term, city) task",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue the crawl recorded in --journal, skipping completed tasks",
+    )
+    parser.add_argument(
+        "--queue",
+        help="SQLite task queue shared with other workers; tasks are leased from it "
+        "and results are written to a per-worker shard",
+    )
+    parser.add_argument(
+        "--worker_id",
+        default=f"{socket.gethostname()}-{os.getpid()}",
+        help="Name of this worker in --queue leases and shard file names",
+    )
+    parser.add_argument(
+        "--lease_seconds",
+        default=300.0,
+        type=float,
+        help="Seconds a leased task stays reserved for this worker without a heartbeat",
+    )
+    parser.add_argument(
+        "--max_attempts",
+        default=3,
+        type=int,
+        help="Times a --queue task is leased before it is given up as failed",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only extract listings that are new or changed since the runs in --job_index",
+    )
+    parser.add_argument(
+        "--job_index",
+        default=str(output_dir.joinpath("job_index.sqlite3")),
+        help="SQLite file remembering the listings extracted by earlier runs",
+    )
+    parser.add_argument(
+        "--max_in_flight",
+        default=100,
+        type=int,
+        help="Jobs extracted per page.evaluate call and records waiting to be written at most; "
+        "bounds the memory used for scraped records",
+    )
+    parser.add_argument(
+        "--storage_state",
+        help="JSON file the cookies and local storage of the contexts are saved to and restored from, "
+        "so consent and session setup carry over between cities and runs",
+    )
+    parser.add_argument(
+        "--prometheus_file",
+        help="Also write the crawl metrics to this Prometheus textfile (.prom)",
+    )
+    capture = parser.add_mutually_exclusive_group()
+    capture.add_argument(
+        "--record",
+        metavar="DIR",
+        help="Save the HTML of every scrolled results page into DIR",
+    )
+    capture.add_argument(
+        "--replay",
+        metavar="DIR",
+        help="Serve the pages recorded in DIR instead of querying Google",
+    )
 
-    return parser.parse_args()
+    args = parser.parse_args()
+    if args.terms_file:
+        args.terms += read_lines(args.terms_file)
+    if not args.terms:
+        parser.error("at least one job term is required")
+    for location_set in args.locations:
+        try:
+            resolve_locations(location_set)
+        except ValueError as e:
+            parser.error(str(e))
+    if args.fetcher == "http" and args.replay:
+        parser.error(
+            "--replay needs a browser, serve the captures with mock_server.py instead"
+        )
+    if args.replay and (args.resume or args.incremental or args.queue):
+        parser.error(
+            "--replay cannot be combined with --resume, --incremental or --queue, "
+            "which would mix captured pages into the state of live crawls"
+        )
+
+    return args
 
 
 async def main() -> None:
-    """The `main` function uses Playwright to run a search query for a given term in multiple US cities."""
+    # pylint: disable=too-many-locals,too-many-branches,too-many-statements
+    """The `main` function uses Playwright to run a search query for every job term in every location.
+
+    The terms and location sets are expanded into one deduplicated task matrix. A single browser is
+    launched for the whole matrix and the tasks are crawled concurrently by a pool of `--concurrency`
+    browser contexts.
+
+    """
     start_time = time.perf_counter()
     args = parse_args()
 
-    for city in US_CITIES:
-        async with async_playwright() as playwright:
-            await run(
-                playwright,
+    tasks = build_task_matrix(args.terms, args.locations)
+    logger.debug(f"{len(tasks)} tasks for {len(set(t for t, _ in tasks))} terms")
+
+    # Sharded and queue workers write their own files, merge_outputs.py dedupes across them afterwards
+    suffix = ""
+    if args.shard is not None:
+        shard_index, shard_count = args.shard
+        tasks = select_shard(tasks, shard_index, shard_count)
+        suffix = f"_shard-{shard_index}-of-{shard_count}"
+        args.journal = str(
+            Path(args.journal).with_stem(Path(args.journal).stem + suffix)
+        )
+        logger.debug(f"Shard {shard_index}/{shard_count}: {len(tasks)} tasks")
+
+    recorder = PageRecorder(args.record) if args.record else None
+    replayer = PageReplayer(args.replay) if args.replay else None
+    replay_dir = None
+    if replayer is not None:
+        # Captured pages are already fully scrolled and replays must not mix with live crawl state
+        tasks = [
+            task for task in tasks if replayer.has_capture(f"{task[0]} in {task[1]}")
+        ]
+        args.max_scroll = 0
+        args.fingerprints = None
+        args.storage_state = None
+        # A throwaway journal, resetting the default one would lose the resume state of a live crawl
+        # Removed once the crawl is over, or at exit if it never starts
+        replay_dir = tempfile.TemporaryDirectory(prefix="replay-")
+        args.journal = str(Path(replay_dir.name).joinpath("crawl_state.sqlite3"))
+        logger.debug(f"Replaying {len(tasks)} captured queries from '{args.replay}'")
+
+    if args.queue:
+        suffix += f"_{args.worker_id}"
+    output_path = json_file_path.replace(".ndjson", f"{suffix}.ndjson")
+    sightings_path = sightings_file_path.replace(".ndjson", f"{suffix}.ndjson")
+    metrics_path = metrics_file_path.replace(".json", f"{suffix}.json")
+    checkpoint = sightings_checkpoint = None
+    if args.queue:
+        tracker = TaskQueue(
+            args.queue,
+            args.worker_id,
+            lease_seconds=args.lease_seconds,
+            max_attempts=args.max_attempts,
+        )
+        args.fingerprints = None
+        await asyncio.to_thread(tracker.add_tasks, tasks)
+    else:
+        tracker = CrawlJournal(args.journal)
+        if args.resume and tracker.get_meta("output_path"):
+            output_path = tracker.get_meta("output_path")
+            sightings_path = tracker.get_meta("sightings_path")
+            checkpoint = tracker.output_checkpoint() or (0, 0)
+            sightings_checkpoint = tracker.sightings_checkpoint() or (0, 0)
+            logger.debug(f"Resuming {tracker.counts()} into '{output_path}'")
+        else:
+            tracker.reset()
+            tracker.set_meta("output_path", output_path)
+            tracker.set_meta("sightings_path", sightings_path)
+        tracker.add_tasks(tasks)
+        tasks = tracker.remaining(tasks)
+
+    async def track(update: Callable, *update_args, **update_kwargs) -> None:
+        # Writes to a shared queue wait for the other workers, so they run in a thread
+        if args.queue:
+            await asyncio.to_thread(update, *update_args, **update_kwargs)
+        else:
+            update(*update_args, **update_kwargs)
+
+    async def handle_task(context: BrowserContext, term: str, city: str) -> int:
+        tracker.mark_in_flight(term, city)
+        try:
+            jobs_count = await run(
+                context,
+                sink,
                 max_scroll=args.max_scroll,
-                query=f"{args.term} in {city}",
+                query=f"{term} in {city}",
+                city=city,
+                plateau_timeout=args.plateau_timeout,
+                time_budget=args.city_budget,
+                extraction=args.extraction,
+                dedupe=dedupe,
+                job_index=job_index,
+                recorder=recorder,
+                executor=executor,
+                metrics=metrics,
+                batch_size=args.max_in_flight,
+                fetcher=http_fetcher,
+                base_url=args.search_url,
+            )
+        except Exception as e:
+            await track(tracker.mark_failed, term, city, repr(e))
+            raise
+
+        with metrics.phase("save"):
+            await sink.flush()
+            await sightings.flush()
+        await track(
+            tracker.mark_done,
+            term,
+            city,
+            *sink.position,
+            sightings_position=sightings.position,
+        )
+        if job_index is not None:
+            job_index.commit(f"{term} in {city}")
+        return jobs_count
+
+    sink = NdjsonSink(
+        output_path,
+        fsync_interval=args.fsync_interval,
+        max_bytes=args.rotate_mb * 1024 * 1024,
+        resume_at=checkpoint,
+        max_pending=args.max_in_flight,
+    )
+    sightings = NdjsonSink(
+        sightings_path,
+        fsync_interval=args.fsync_interval,
+        resume_at=sightings_checkpoint,
+    )
+    if args.fingerprints:
+        # A resumed crawl starts over from the fingerprints saved before the crawl began and adds back
+        # the jobs of its output once cut at the checkpoint. The fingerprints saved on interruption also
+        # hold the jobs cut off, which would make the retried tasks drop their own jobs as duplicates.
+        start_path = f"{args.fingerprints}.start"
+        if checkpoint is None:
+            fingerprints = FingerprintSet.load(
+                args.fingerprints, max_items=args.dedupe_max_items
             )
+            fingerprints.save(start_path)
+        else:
+            fingerprints = FingerprintSet.load(
+                start_path if Path(start_path).exists() else args.fingerprints,
+                max_items=args.dedupe_max_items,
+            )
+    else:
+        fingerprints = FingerprintSet(args.dedupe_max_items)
+    dedupe = Deduplicator(fingerprints, sightings)
+
+    blocker = ResourceBlocker(args.block)
+    metrics = CrawlMetrics()
+    recycle = None
+    if args.recycle_pages or args.recycle_context_mb or args.recycle_browser_mb:
+        recycle = RecyclePolicy(
+            context_pages=args.recycle_pages,
+            context_mb=args.recycle_context_mb,
+            browser_mb=args.recycle_browser_mb,
+            browser_min_pages=args.recycle_browser_min_pages,
+        )
+    storage_state = StorageState(args.storage_state) if args.storage_state else None
+    controller = None
+    if args.adaptive:
+        controller = AdaptiveController(
+            args.concurrency, min_concurrency=args.min_concurrency
+        )
+    job_index = JobIndex(args.job_index) if args.incremental else None
+    executor = None
+    http_fetcher = None
+    if args.fetcher == "http":
+        http_fetcher = HttpFetcher(
+            args.search_url, max_connections=args.max_connections, recorder=recorder
+        )
+    if args.extraction == "html" or http_fetcher is not None:
+        executor = ProcessPoolExecutor(max_workers=args.parse_workers)
+
+    context_setup = replayer.attach if replayer else blocker.attach
+    if http_fetcher is not None:
+        # Routing, storage state and memory only matter in a browser, and no driver is needed at all
+        context_setup = storage_state = recycle = None
+    playwright_manager = (
+        async_playwright() if http_fetcher is None else contextlib.nullcontext()
+    )
+
+    async with sink, sightings, playwright_manager as playwright:
+        if checkpoint is not None:
+            # Jobs saved before the interruption must still count as already seen
+            dedupe.fingerprints.add_from_output(sink.part_paths)
+
+        browser_factory = None
+        if http_fetcher is not None:
+            browser = http_fetcher
+        else:
+            browser_factory = functools.partial(
+                launch_browser, playwright, args.engine, args.launch_preset
+            )
+            with metrics.phase("launch"):
+                browser = await browser_factory()
+        scheduler = CrawlScheduler(
+            browser,
+            handler=handle_task,
+            concurrency=args.concurrency,
+            context_setup=context_setup,
+            controller=controller,
+            context_options=storage_state.context_options if storage_state else None,
+            context_teardown=storage_state.save if storage_state else None,
+            recycle=recycle,
+            browser_factory=browser_factory,
+        )
+        try:
+            if args.queue:
+                keep_alive = asyncio.create_task(tracker.keep_alive())
+                try:
+                    await scheduler.run_leased(tracker.lease)
+                finally:
+                    keep_alive.cancel()
+            else:
+                await scheduler.run(tasks)
+        finally:
+            # The scheduler may have relaunched the browser it was given
+            await scheduler.browser.close()
+            if args.fingerprints:
+                dedupe.fingerprints.save(args.fingerprints)
+            logger.debug(f"Crawl state: {tracker.counts()}")
+            tracker.close()
+            if replay_dir is not None:
+                replay_dir.cleanup()
+            if job_index is not None:
+                logger.debug(f"Incremental crawl: {job_index.counts}")
+                job_index.close()
+            if executor is not None:
+                executor.shutdown()
+            metrics.write_json(metrics_path)
+            if args.prometheus_file:
+                metrics.write_prometheus(args.prometheus_file)
+
+    logger.debug(
+        f"Saved {sink.records_written} jobs, skipped {dedupe.duplicates} duplicates"
+    )
+    logger.debug(f"Resource blocking: {blocker.summary()}")
+    if http_fetcher is not None:
+        logger.debug(f"HTTP fetcher: {http_fetcher.summary()}")
+    if controller is not None:
+        logger.debug(f"Adaptive concurrency: {controller.summary()}")
+    if storage_state is not None:
+        ttfc = metrics.summary()["phases"].get("time_to_first_card", {})
+        logger.debug(
+            f"Storage state: {storage_state.summary()}, "
+            f"time to first card p50 {ttfc.get('p50')}s, p95 {ttfc.get('p95')}s"
+        )
+    if recycle is not None:
+        logger.debug(f"Recycling: {recycle.summary()}")
+    logger.debug(f"Peak RSS: {metrics.summary()['peak_rss_mb']} MB")
+    logger.debug(f"Metrics saved to '{metrics_path}'")
 
     minutes = (time.perf_counter() - start_time) / 60
     logger.debug(f"Time elapsed: {round(minutes, 1)} minutes")
@@ -0,0 +1,123 @@
+"""html_backend.py extracts job listings from the HTML of a scrolled results page without a browser.
+
+Once a page has been scrolled, everything the scraper reads is in `page.content()`. `parse_jobs_html`
+parses that HTML with lxml using the same XPaths as `extract_data`, so it can run in a worker process
+while the browser is already loading the next city.
+"""
+
+from __future__ import annotations
+
+from urllib.parse import unquote
+
+from lxml import html as lxml_html
+
+xpath_jobs_tabs = "//div[@class='gws-plugins-horizon-jobs__tl-lif']"
+xpath_job_detail = "//div[@id='gws-plugins-horizon-jobs__job_details_page']"
+xpath_title = ".//h2[@class='KLsYvd']"
+xpath_employer = ".//div[contains(@class, 'nJlQNd')]"
+xpath_job_description_span = ".//span[@class='HBvzbc']"
+xpath_job_highlights = ".//div[@class='JxVj3d']//div[@class='IiQJ2c']"
+xpath_listing_id = ".//*[@data-encoded-doc-id or @data-docid]"
+xpath_share_url = ".//*[@data-share-url]"
+
+# Elements innerText separates from their neighbours with a line break
+block_tags = (
+    "address", "article", "aside", "blockquote", "br", "dd", "div", "dl", "dt",
+    "figcaption", "figure", "footer", "form", "h1", "h2", "h3", "h4", "h5", "h6",
+    "header", "hr", "li", "main", "nav", "ol", "p", "pre", "section", "table",
+    "td", "th", "tr", "ul",
+)  # fmt: skip
+
+
+def count_job_cards(page_html: str) -> int:
+    """The `count_job_cards` function counts the job cards of a results page without parsing it.
+
+    Like `xpath_jobs_tabs`, it only matches elements whose class attribute is exactly the card class.
+
+    """
+    return page_html.count('class="gws-plugins-horizon-jobs__tl-lif"')
+
+
+def clean_text(element) -> str:
+    """The `clean_text` function returns the text of `element` with its whitespace collapsed."""
+    return " ".join(element.text_content().split())
+
+
+def fnv1a(text: str) -> str:
+    """The `fnv1a` function hashes `text` exactly like the `fnv1a` helper of `index_jobs_js`.
+
+    The browser hashes UTF-16 code units, so the text is hashed as UTF-16 too and both extraction
+    backends agree on the content hash stored in the job index.
+
+    """
+    value = 0x811C9DC5
+    for unit in memoryview(text.encode("utf-16-le")).cast("H"):
+        value = ((value ^ unit) * 0x01000193) & 0xFFFFFFFF
+    return format(value, "x")
+
+
+def listing_id(element) -> str | None:
+    """The `listing_id` function returns the Google job id exposed inside `element`, if any."""
+    if element is None:
+        return None
+
+    tagged = element.xpath(xpath_listing_id)
+    if tagged:
+        return tagged[0].get("data-encoded-doc-id") or tagged[0].get("data-docid")
+
+    for shared in element.xpath(xpath_share_url):
+        for param in shared.get("data-share-url").split("?", 1)[-1].split("&"):
+            if param.startswith("htidocid="):
+                return unquote(param[len("htidocid=") :])
+    return None
+
+
+def parse_jobs_html(page_html: str) -> list[dict]:
+    """The `parse_jobs_html` function extracts every job listing of a scrolled results page.
+
+    Parameters
+    ----------
+    page_html : str
+        The `page_html` parameter is the HTML of the results page, as returned by `page.content()`.
+
+    Returns
+    -------
+        A list with one dictionary per listing holding `title`, `employer`, `job_description` and
+    `job_highlights` cleaned like `clean_data` does, plus the `listing_id` and `content_hash` used by
+    incremental crawls.
+
+    """
+    if not page_html.strip():
+        return []
+
+    tree = lxml_html.fromstring(page_html)
+    # Mark block boundaries so words of adjacent blocks stay apart, like innerText keeps them
+    for element in tree.iter(*block_tags):
+        element.text = "\n" + (element.text or "")
+        element.tail = "\n" + (element.tail or "")
+    cards = tree.xpath(xpath_jobs_tabs)
+    details = tree.xpath(xpath_job_detail)[: len(cards)]
+
+    jobs = []
+    for card, job in zip(cards, details):
+        title = job.xpath(xpath_title)
+        employer = job.xpath(xpath_employer)
+        job_description = " | ".join(
+            clean_text(e) for e in job.xpath(xpath_job_description_span)
+        )
+        job_highlights = " | ".join(
+            clean_text(e) for e in job.xpath(xpath_job_highlights)
+        )
+
+        jobs.append(
+            {
+                "title": clean_text(title[0]) if title else "",
+                "employer": clean_text(employer[0]) if employer else "",
+                "job_description": job_description,
+                "job_highlights": job_highlights,
+                "listing_id": listing_id(card) or listing_id(job),
+                "content_hash": fnv1a(job_description + " | " + job_highlights),
+            }
+        )
+
+    return jobs
@@ -0,0 +1,118 @@
+"""job_index.py remembers every listing extracted by earlier crawls so daily runs only extract the delta.
+
+A listing is identified by the job id Google exposes in the DOM when there is one, and by its normalized
+title and employer otherwise. Next to the identity the index keeps a hash of the listing content that is
+computed inside the browser, so a listing can be classified as `new`, `seen` or `updated` before its
+description and highlights are pulled out of the page.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import sqlite3
+import time
+
+from dedupe import normalize
+
+logger = logging.getLogger(__name__)
+
+NEW = "new"
+SEEN = "seen"
+UPDATED = "updated"
+
+
+def listing_key(listing_id: str | None, title: str, employer: str) -> str:
+    """The `listing_key` function returns the stable identity of a listing.
+
+    Parameters
+    ----------
+    listing_id : str | None
+        The `listing_id` parameter is the job id found in the DOM, or None if the page does not expose one.
+    title : str
+        The `title` parameter is the job title shown on the listing.
+    employer : str
+        The `employer` parameter is the employer name shown on the listing.
+
+    Returns
+    -------
+        `id:<listing_id>` when the id is known, otherwise `tf:<hash of title and employer>`.
+
+    """
+    if listing_id:
+        return f"id:{listing_id}"
+    key = "\x1f".join([normalize(title), normalize(employer)])
+    return f"tf:{hashlib.sha1(key.encode()).hexdigest()}"
+
+
+class JobIndex:
+    """The `JobIndex` class persists the identity and content hash of every listing in a SQLite file.
+
+    Parameters
+    ----------
+    path : str
+        The `path` parameter is the SQLite file of the index. It is created if it does not exist and is
+    meant to be kept between runs.
+
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.connection = sqlite3.connect(path, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS listings (
+                key TEXT PRIMARY KEY,
+                content_hash TEXT NOT NULL,
+                first_seen REAL NOT NULL,
+                last_seen REAL NOT NULL
+            )
+            """)
+        self.counts = {NEW: 0, SEEN: 0, UPDATED: 0}
+        # Entries of the tasks still running, only stored once the task and its records are saved
+        self.pending: dict[str, list[tuple[str, str]]] = {}
+
+    def classify(self, key: str, content_hash: str) -> str:
+        """The `classify` method tells whether the listing is `new`, `seen` unchanged or `updated`."""
+        row = self.connection.execute(
+            "SELECT content_hash FROM listings WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            status = NEW
+        elif row[0] == content_hash:
+            status = SEEN
+        else:
+            status = UPDATED
+        self.counts[status] += 1
+        return status
+
+    def stage(self, query: str, entries: list[tuple[str, str]]) -> None:
+        """The `stage` method keeps the `(key, content_hash)` pairs crawled by the task of `query` until
+        `commit` is called for it. Entries of a task that is interrupted are never stored, so its listings
+        are extracted again when the task is retried.
+
+        """
+        self.pending.setdefault(query, []).extend(entries)
+
+    def commit(self, query: str) -> None:
+        """The `commit` method stores the entries staged for `query`, once its records are saved."""
+        self.update(self.pending.pop(query, []))
+
+    def update(self, entries: list[tuple[str, str]]) -> None:
+        """The `update` method stores the `(key, content_hash)` pairs of listings that were just crawled."""
+        now = time.time()
+        self.connection.executemany(
+            "INSERT INTO listings (key, content_hash, first_seen, last_seen) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET content_hash = excluded.content_hash, "
+            "last_seen = excluded.last_seen",
+            [(key, content_hash, now, now) for key, content_hash in entries],
+        )
+
+    def close(self) -> None:
+        """The `close` method closes the SQLite connection, dropping the entries never committed."""
+        if self.pending:
+            logger.debug(
+                f"Dropping the index entries of {len(self.pending)} unfinished tasks"
+            )
+        self.connection.close()
@@ -0,0 +1,127 @@
+"""keyword_benchmark.py measures how keyword matching scales with the size of the dictionary.
+
+Synthetic dictionaries of one to four word terms are built at growing sizes, up to 100k terms, and the
+same synthetic descriptions are matched against each of them with `KeywordMatcher`. The old approach,
+splitting on whitespace and testing every word against the list of terms, is timed alongside up to
+`--max_scan` terms. The matcher's time per MB of text stays flat as the dictionary grows, the scan grows
+with it.
+
+Usage:
+
+    python keyword_benchmark.py --sizes 1000 10000 100000 --text_mb 2
+"""
+
+import argparse
+import random
+import string
+import time
+
+from keyword_const import COMPUTER_SCIENCE_TERMS
+from keyword_matcher import KeywordMatcher
+
+
+def make_words(count: int, rng: random.Random) -> list[str]:
+    """The `make_words` function returns `count` distinct random lowercase words."""
+    words = set()
+    while len(words) < count:
+        words.add("".join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 9))))
+    return sorted(words)
+
+
+def make_dictionary(size: int, words: list[str], rng: random.Random) -> list[str]:
+    """The `make_dictionary` function returns the real terms padded with random terms up to `size`."""
+    terms = set(COMPUTER_SCIENCE_TERMS[:size])
+    while len(terms) < size:
+        terms.add(" ".join(rng.choices(words, k=rng.randint(1, 4))))
+    return sorted(terms)
+
+
+def make_text(megabytes: float, words: list[str], rng: random.Random) -> str:
+    """The `make_text` function returns about `megabytes` of description-like text.
+
+    Most words come from `words`, the rest are real terms with the punctuation descriptions put around
+    them.
+
+    """
+    pieces = []
+    length = 0
+    while length < megabytes * 1_000_000:
+        if rng.random() < 0.1:
+            piece = rng.choice(COMPUTER_SCIENCE_TERMS).upper() + rng.choice(",.; ")
+        else:
+            piece = rng.choice(words)
+        pieces.append(piece)
+        length += len(piece) + 1
+    return " ".join(pieces)
+
+
+def scan(text: str, terms: list[str]) -> list[str]:
+    """The `scan` function is the former matching: every whitespace token is looked up in the list."""
+    return [token for token in text.lower().split() if token in terms]
+
+
+def parse_args():
+    """The `parse_args` function parses the dictionary sizes and the amount of text to match."""
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--sizes",
+        nargs="+",
+        default=[1_000, 10_000, 100_000],
+        type=int,
+        help="Dictionary sizes to benchmark",
+    )
+    parser.add_argument(
+        "--text_mb", default=2.0, type=float, help="Megabytes of text to match"
+    )
+    parser.add_argument(
+        "--max_scan",
+        default=10_000,
+        type=int,
+        help="Largest dictionary the list scan is timed on, it is quadratic",
+    )
+    parser.add_argument("--seed", default=0, type=int, help="Random seed")
+    return parser.parse_args()
+
+
+def main() -> None:
+    """The `main` function times the matcher and the list scan for every dictionary size."""
+    args = parse_args()
+    rng = random.Random(args.seed)
+    words = make_words(50_000, rng)
+    text = make_text(args.text_mb, words, rng)
+    # Descriptions are matched one at a time, as parse_data.py does
+    descriptions = [text[i : i + 4000] for i in range(0, len(text), 4000)]
+    megabytes = len(text) / 1_000_000
+
+    columns = ["terms", "build_s", "matcher_s_per_mb", "matches", "scan_s_per_mb"]
+    print(" | ".join(columns))
+    for size in args.sizes:
+        terms = make_dictionary(size, words, rng)
+
+        start = time.perf_counter()
+        matcher = KeywordMatcher(terms)
+        build_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        matches = sum(len(matcher.find(description)) for description in descriptions)
+        matcher_seconds = time.perf_counter() - start
+
+        scan_seconds = None
+        if size <= args.max_scan:
+            start = time.perf_counter()
+            for description in descriptions:
+                scan(description, terms)
+            scan_seconds = round((time.perf_counter() - start) / megabytes, 3)
+
+        row = [
+            size,
+            round(build_seconds, 3),
+            round(matcher_seconds / megabytes, 3),
+            matches,
+            scan_seconds,
+        ]
+        print(" | ".join(str(value) for value in row))
+
+
+if __name__ == "__main__":
+    main()
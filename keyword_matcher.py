@@ -0,0 +1,113 @@
+"""keyword_matcher.py finds every keyword of a fixed dictionary, single or multi-word, in one pass over a text.
+
+`KeywordMatcher` compiles the dictionary into an Aho-Corasick automaton whose alphabet is words instead of
+characters. The text is normalized into the same words as the dictionary, so punctuation stuck to a word
+("python," or "aws.") no longer hides it, and then walked once: every word costs one dictionary lookup
+and one transition, however many keywords there are.
+"""
+
+import collections
+from collections.abc import Iterable
+
+# Punctuation stripped from the start and the end of a word. Leading dots (".net") and trailing symbols
+# ("c++", "c#") are part of keywords and kept.
+leading_punctuation = "\"'`([{<*,;:!?"
+trailing_punctuation = "\"'`)]}>*,;:!?."
+
+
+class KeywordMatcher:
+    """The `KeywordMatcher` class finds the keywords of a dictionary in texts with word boundaries.
+
+    Parameters
+    ----------
+    keywords : Iterable[str]
+        The `keywords` parameter holds the keywords to find. Keywords are matched without case, and
+    multi-word keywords match the same words separated by any whitespace.
+
+    """
+
+    def __init__(self, keywords: Iterable[str]) -> None:
+        self.keywords: list[str] = []
+        self.vocabulary: dict[str, int] = {}
+        # Node 0 is the root; each node has its transitions, its failure link and its matches
+        self._goto: list[dict[int, int]] = [{}]
+        self._fail: list[int] = [0]
+        self._output: list[tuple[int, ...]] = [()]
+
+        outputs: list[list[int]] = [[]]
+        for keyword in dict.fromkeys(keywords):
+            words = self._split(keyword, split_slashes=False)
+            if not words:
+                continue
+            node = 0
+            for word in words:
+                word_id = self.vocabulary.setdefault(word, len(self.vocabulary))
+                if word_id not in self._goto[node]:
+                    self._goto.append({})
+                    self._fail.append(0)
+                    outputs.append([])
+                    self._goto[node][word_id] = len(self._goto) - 1
+                node = self._goto[node][word_id]
+            if not outputs[node]:
+                self.keywords.append(" ".join(words))
+                outputs[node].append(len(self.keywords) - 1)
+
+        # Breadth-first, so the failure link of a node is final before its children need it. Nodes of the
+        # first level fail back to the root.
+        queue = collections.deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            outputs[node].extend(outputs[self._fail[node]])
+            for word_id, child in self._goto[node].items():
+                fail = self._fail[node]
+                while fail and word_id not in self._goto[fail]:
+                    fail = self._fail[fail]
+                if node:
+                    self._fail[child] = self._goto[fail].get(word_id, 0)
+                queue.append(child)
+        self._output = [tuple(node_outputs) for node_outputs in outputs]
+
+    def __len__(self) -> int:
+        return len(self.keywords)
+
+    def _split(self, text: str, split_slashes: bool = True) -> list[str]:
+        """The `_split` method normalizes `text` into the lowercase words keywords are made of.
+
+        Words joined by a slash are split apart, unless `split_slashes` is False or the joined word is
+        itself in the vocabulary.
+
+        """
+        words = []
+        for word in text.lower().split():
+            word = word.lstrip(leading_punctuation).rstrip(trailing_punctuation)
+            if not word:
+                continue
+            if split_slashes and "/" in word and word not in self.vocabulary:
+                # "python/django" is two keywords, while "tcp/ip" is one
+                words.extend(part for part in word.split("/") if part)
+            else:
+                words.append(word)
+        return words
+
+    def find(self, text: str) -> list[str]:
+        """The `find` method returns every keyword occurrence of `text`, in the order they end.
+
+        Keywords contained in a longer keyword that also matched, such as "web services" in "amazon web
+        services", are reported as well.
+
+        """
+        found = []
+        node = 0
+        goto, fail, output = self._goto, self._fail, self._output
+        for word in self._split(text):
+            word_id = self.vocabulary.get(word)
+            if word_id is None:
+                # No keyword contains this word, every partial match is over
+                node = 0
+                continue
+            while node and word_id not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(word_id, 0)
+            for keyword_id in output[node]:
+                found.append(self.keywords[keyword_id])
+        return found
@@ -1,17 +1,59 @@
-from parse_data import get_raw_data, write_all_occurrences
+import argparse
+import os
+
+from parse_data import update_occurrences
+
+
+def parse_args():
+    """The `parse_args` function parses the command, the scraped files to report on and the number of
+    workers.
+
+    """
+    parser = argparse.ArgumentParser()
+    commands = parser.add_subparsers(dest="command")
+    report = commands.add_parser("report", help="Count every job of the files again")
+    update = commands.add_parser(
+        "update", help="Add the new jobs of the files to the saved reports"
+    )
+    for command in (report, update):
+        command.add_argument(
+            "paths",
+            nargs="+",
+            help="JSON or NDJSON files written by the scraper, optionally .gz or .zst",
+        )
+        command.add_argument(
+            "--reports",
+            help="Directory of the reports and their state, the first file's by default",
+        )
+        command.add_argument(
+            "--workers",
+            default=1,
+            type=int,
+            help="Processes extracting keywords, the reports are the same for any number",
+        )
+    parser.set_defaults(
+        command="report",
+        paths=["results/Python Developer 2023-10-15/google_jobs_data.json"],
+        reports=None,
+        workers=1,
+    )
+    return parser.parse_args()
 
 
 def main() -> None:
-    """The main function reads data from a JSON file, extracts the path, and writes all occurrences of the
-    data to a file in the same directory.
+    """The main function reads data from the scraped files, extracts the path, and writes all occurrences
+    of the data to a file in the same directory. `update` only reads the jobs added since the last run.
 
     """
-    path = "results/Python Developer 2023-10-15/google_jobs_data.json"
-    data = get_raw_data(path)
+    args = parse_args()
+    path = args.reports or os.path.dirname(args.paths[0]) or "."
 
-    path = path.split("/")
-    path = "/".join(path[:-1])
-    write_all_occurrences(data, path)
+    try:
+        update_occurrences(
+            args.paths, path, workers=args.workers, rebuild=args.command == "report"
+        )
+    except ValueError as e:
+        raise SystemExit(f"{e}, run the report command to count every job again") from e
 
 
 if __name__ == "__main__":
@@ -0,0 +1,129 @@
+"""merge_outputs.py combines the NDJSON outputs of several scraper workers into one deduplicated file.
+
+Workers of a shared crawl, and machines each crawling one `--shard`, write their own output shard, so the
+same posting can end up in several shards when it was found under queries handled by different workers.
+Records are streamed shard by shard and only the first record of every fingerprint is kept. As during the
+crawl, the duplicates dropped are written as sightings, pointing back at the kept record with the city
+and query they were found under, after the sightings the workers wrote themselves.
+
+Usage:
+
+    python merge_outputs.py output/merged.ndjson output/google_jobs_data_*_worker-*.ndjson
+    python merge_outputs.py output/merged.ndjson "output/google_jobs_data_*_shard-*.ndjson"
+"""
+
+from __future__ import annotations
+
+import argparse
+import glob
+import json
+import logging
+from pathlib import Path
+
+from dedupe import FingerprintSet, job_fingerprint
+from job_index import UPDATED
+
+logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+
+def sightings_path_for(path: str) -> Path:
+    """The `sightings_path_for` function returns the sightings file that goes with the output `path`."""
+    path = Path(path)
+    if "google_jobs_data" in path.name:
+        return path.with_name(
+            path.name.replace("google_jobs_data", "google_jobs_sightings")
+        )
+    return path.with_name(f"{path.stem}_sightings{path.suffix}")
+
+
+def merge_outputs(
+    paths: list[str], output_path: str, sightings_path: str | None = None
+) -> tuple[int, int]:
+    """The `merge_outputs` function writes the records of every NDJSON file of `paths` to `output_path`,
+    dropping repeated postings.
+
+    Parameters
+    ----------
+    paths : list[str]
+        The `paths` parameter holds the NDJSON shards to merge, read in the given order.
+    output_path : str
+        The `output_path` parameter is the NDJSON file the merged records are written to.
+    sightings_path : str | None
+        The `sightings_path` parameter is the NDJSON file the sightings of every shard and the duplicates
+    dropped are written to, `sightings_path_for(output_path)` by default.
+
+    Returns
+    -------
+        The number of records written and the number of duplicates dropped.
+
+    """
+    fingerprints = FingerprintSet()
+    written = duplicates = 0
+    sightings_path = sightings_path or sightings_path_for(output_path)
+
+    with open(output_path, "w", encoding="utf-8") as outfile, open(
+        sightings_path, "w", encoding="utf-8"
+    ) as sightings:
+        for path in paths:
+            shard_sightings = sightings_path_for(path)
+            if shard_sightings.exists():
+                with open(shard_sightings, "r", encoding="utf-8") as infile:
+                    sightings.writelines(line for line in infile if line.strip())
+
+            with open(path, "r", encoding="utf-8") as infile:
+                for line in infile:
+                    if not line.strip():
+                        continue
+                    record = json.loads(line)
+                    fingerprint = record.get("fingerprint") or job_fingerprint(
+                        record["title"], record["employer"], record["job_description"]
+                    )
+                    # Same keys as Deduplicator.check, a new revision of a listing is kept once
+                    key = fingerprint
+                    if record.get("status") == UPDATED:
+                        key = f"{fingerprint}:{record['content_hash']}"
+                    if key in fingerprints:
+                        duplicates += 1
+                        sighting = {
+                            "fingerprint": fingerprint,
+                            "city": record.get("city"),
+                            "query": record.get("query"),
+                        }
+                        sightings.write(json.dumps(sighting) + "\n")
+                        continue
+                    fingerprints.add(key)
+                    outfile.write(json.dumps(record) + "\n")
+                    written += 1
+
+    return written, duplicates
+
+
+def parse_args():
+    """The `parse_args` function parses the output file and the shard files or glob patterns to merge."""
+    parser = argparse.ArgumentParser()
+    parser.add_argument("output", help="Merged NDJSON file to write")
+    parser.add_argument("shards", nargs="+", help="NDJSON shard files or glob patterns")
+    parser.add_argument(
+        "--sightings",
+        help="Merged sightings file to write, next to the output file by default",
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    """The `main` function merges the shards given on the command line."""
+    args = parse_args()
+    paths = sorted({path for pattern in args.shards for path in glob.glob(pattern)})
+    paths = [path for path in paths if path != args.output]
+
+    written, duplicates = merge_outputs(paths, args.output, args.sightings)
+    logger.debug(
+        f"Merged {len(paths)} shards into '{args.output}': "
+        f"{written} jobs, {duplicates} duplicates kept as sightings in "
+        f"'{args.sightings or sightings_path_for(args.output)}'"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""mock_server.py serves pages recorded with `--record` over HTTP, standing in for Google search.
+
+It answers `/search?q=<query>` with the capture of that query and 404 for anything else, so the
+scraper can be run and benchmarked offline with either fetcher by pointing `--search_url` at it. An
+optional delay imitates the latency of the real server.
+
+Usage:
+
+    python mock_server.py captures --port 8000
+    python google_jobs_scraper.py "Backend engineer" --fetcher http --search_url http://127.0.0.1:8000/search
+"""
+
+import argparse
+import contextlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import logging
+from pathlib import Path
+import threading
+import time
+
+from page_capture import MANIFEST_NAME, query_from_url
+
+logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+
+class CaptureServer(ThreadingHTTPServer):
+    """The `CaptureServer` class is an HTTP server answering search requests from a capture directory.
+
+    Parameters
+    ----------
+    address : tuple[str, int]
+        The `address` parameter is the `(host, port)` to listen on, port 0 picks a free port.
+    directory : str
+        The `directory` parameter is a capture directory written by `PageRecorder`.
+    delay : float
+        The `delay` parameter is the number of seconds every response is held back.
+
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self, address: tuple[str, int], directory: str, delay: float = 0.0
+    ) -> None:
+        super().__init__(address, CaptureHandler)
+        self.directory = Path(directory)
+        self.manifest: dict[str, str] = json.loads(
+            self.directory.joinpath(MANIFEST_NAME).read_text(encoding="utf-8")
+        )
+        self.delay = delay
+        self.served = 0
+        self.missing = 0
+
+    @property
+    def search_url(self) -> str:
+        """The `search_url` property is the URL to pass as `--search_url`."""
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/search"
+
+
+class CaptureHandler(BaseHTTPRequestHandler):
+    """The `CaptureHandler` class answers one request of a `CaptureServer`."""
+
+    protocol_version = "HTTP/1.1"
+    server: CaptureServer
+
+    def do_GET(self) -> None:  # pylint: disable=invalid-name
+        """The `do_GET` method sends the capture of the requested query, or a 404."""
+        if self.server.delay:
+            time.sleep(self.server.delay)
+
+        query = query_from_url(self.path)
+        if query is None or query not in self.server.manifest:
+            self.server.missing += 1
+            self._send(404, b"No capture recorded for this page")
+            return
+
+        self.server.served += 1
+        path = self.server.directory.joinpath(self.server.manifest[query])
+        self._send(200, path.read_bytes(), "text/html; charset=utf-8")
+
+    def _send(self, status: int, body: bytes, content_type: str = "text/plain") -> None:
+        """The `_send` method answers the request with `body` and its headers."""
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args) -> None:  # pylint: disable=redefined-builtin
+        logger.debug(f"{self.address_string()} {format % args}")
+
+
+@contextlib.contextmanager
+def serve_captures(
+    directory: str, host: str = "127.0.0.1", port: int = 0, delay: float = 0.0
+):
+    """The `serve_captures` context manager runs a `CaptureServer` in a background thread.
+
+    Parameters
+    ----------
+    directory : str
+        The `directory` parameter is a capture directory written by `PageRecorder`.
+    host : str
+        The `host` parameter is the interface to listen on.
+    port : int
+        The `port` parameter is the port to listen on, 0 picks a free port.
+    delay : float
+        The `delay` parameter is the number of seconds every response is held back.
+
+    Returns
+    -------
+        The running server, its `search_url` property is the URL to fetch.
+
+    """
+    server = CaptureServer((host, port), directory, delay=delay)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+        thread.join()
+
+
+def parse_args():
+    """The `parse_args` function parses the capture directory and where to serve it."""
+    parser = argparse.ArgumentParser()
+    parser.add_argument("directory", help="Capture directory written by --record")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to listen on")
+    parser.add_argument("--port", default=8000, type=int, help="Port to listen on")
+    parser.add_argument(
+        "--delay",
+        default=0.0,
+        type=float,
+        help="Seconds every response is held back to imitate network latency",
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    """The `main` function serves the capture directory until interrupted."""
+    args = parse_args()
+    server = CaptureServer((args.host, args.port), args.directory, delay=args.delay)
+    logger.debug(
+        f"Serving {len(server.manifest)} captures of '{args.directory}' at "
+        f"{server.search_url}"
+    )
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        logger.debug(f"Served {server.served} pages, {server.missing} missing")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+"""ndjson_sink.py streams scraped job records to an append-only NDJSON file, one job per line.
+
+Records are handed over with `put`, `write` or `write_many` and written out by a background flush task,
+so the scraper never re-serializes what it already saved and does not need to keep old records in memory.
+If writing fails, the flush task stops and the error is raised again by the next call handing over or
+flushing records.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+from pathlib import Path
+import time
+
+logger = logging.getLogger(__name__)
+
+NDJSON_SUFFIXES = (".ndjson", ".jsonl")
+
+
+class NdjsonSink:
+    """The `NdjsonSink` class appends job records to an NDJSON file from a background task.
+
+    Parameters
+    ----------
+    path : str
+        The `path` parameter is the file the records are appended to. When rotation is enabled, the
+    following parts are written next to it as `<stem>.1<suffix>`, `<stem>.2<suffix>`, ...
+    fsync_interval : float
+        The `fsync_interval` parameter is the minimum number of seconds between two `os.fsync` calls.
+    Lines are flushed to the OS after every batch, fsync only bounds how much can be lost on a crash.
+    max_bytes : int
+        The `max_bytes` parameter is the size after which the current file is closed and a new part is
+    started. 0 disables rotation.
+    resume_at : tuple[int, int] | None
+        The `resume_at` parameter, when given, is a `(part, byte offset)` previously read from `position`.
+    Output then continues there: that part is truncated to the offset and any later part is removed,
+    dropping whatever was written after that point.
+    max_pending : int
+        The `max_pending` parameter is the number of records that may wait for the flush task. Once it is
+    reached, `put` waits for the file to catch up, which bounds the memory taken by queued records. 0 means
+    no limit, which `write` and `write_many` require.
+
+    """
+
+    def __init__(
+        self,
+        path: str,
+        *,
+        fsync_interval: float = 5.0,
+        max_bytes: int = 0,
+        resume_at: tuple[int, int] | None = None,
+        max_pending: int = 0,
+    ) -> None:
+        self.path = Path(path)
+        self.fsync_interval = fsync_interval
+        self.max_bytes = max_bytes
+        self.resume_at = resume_at
+        self.part = 0
+        self.records_written = 0
+        self._queue: asyncio.Queue[dict] = asyncio.Queue(max_pending)
+        self._file = None
+        self._flush_task = None
+        self._error: Exception | None = None
+        self._last_fsync = time.monotonic()
+
+    @property
+    def current_path(self) -> Path:
+        """The `current_path` property is the file of the part currently being written."""
+        return self._part_path(self.part)
+
+    @property
+    def position(self) -> tuple[int, int]:
+        """The `position` property is the `(part, byte offset)` the file has been written up to.
+
+        Only records written before the last `flush` are guaranteed to be included.
+
+        """
+        return self.part, self._file.tell()
+
+    async def put(self, record: dict) -> None:
+        """The `put` method queues a single record, waiting while `max_pending` records are queued."""
+        self._raise_error()
+        await self._queue.put(record)
+        # The flush task may have failed while waiting, then the record is dropped with the others
+        self._raise_error()
+
+    def write(self, record: dict) -> None:
+        """The `write` method queues a single record for the background flush task."""
+        self._raise_error()
+        self._queue.put_nowait(record)
+
+    def write_many(self, records: list[dict]) -> None:
+        """The `write_many` method queues several records for the background flush task."""
+        self._raise_error()
+        for record in records:
+            self._queue.put_nowait(record)
+
+    async def flush(self) -> None:
+        """The `flush` method returns once every record queued so far has been written to the file, and
+        raises the error that stopped the flush task if writing them failed.
+
+        """
+        await self._queue.join()
+        self._raise_error()
+
+    @property
+    def part_paths(self) -> list[Path]:
+        """The `part_paths` property lists the files written so far, oldest first."""
+        return [self._part_path(part) for part in range(self.part + 1)]
+
+    async def start(self) -> None:
+        """The `start` method opens the output file and starts the background flush task."""
+        if self.resume_at is not None:
+            self.part, offset = self.resume_at
+            later_part = self.part + 1
+            while self._part_path(later_part).exists():
+                self._part_path(later_part).unlink()
+                later_part += 1
+
+        # Kept open until `close`, the flush task writes to it in between
+        self._file = open(  # pylint: disable=consider-using-with
+            self.current_path, "a", encoding="utf-8"
+        )
+        if self.resume_at is not None:
+            self._file.truncate(offset)
+        self._flush_task = asyncio.create_task(self._flush_loop())
+        self._flush_task.add_done_callback(self._flush_done)
+        logger.debug(f"Streaming records into '{self.current_path}'")
+
+    async def close(self) -> None:
+        """The `close` method writes the remaining records, stops the flush task and closes the file."""
+        try:
+            await self.flush()
+        finally:
+            self._flush_task.cancel()
+            await asyncio.gather(self._flush_task, return_exceptions=True)
+            if self._error is None:
+                await self._fsync()
+            self._file.close()
+
+    async def __aenter__(self) -> "NdjsonSink":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    def _part_path(self, part: int) -> Path:
+        """The `_part_path` method returns the file of `part`, the first part being `path` itself."""
+        if not part:
+            return self.path
+        return self.path.with_name(f"{self.path.stem}.{part}{self.path.suffix}")
+
+    async def _fsync(self) -> None:
+        """The `_fsync` coroutine flushes the file to disk without blocking the event loop."""
+        self._file.flush()
+        await asyncio.to_thread(os.fsync, self._file.fileno())
+        self._last_fsync = time.monotonic()
+
+    async def _rotate(self) -> None:
+        """The `_rotate` coroutine closes the current part and continues in the next one."""
+        await self._fsync()
+        self._file.close()
+        self.part += 1
+        # Kept open like the first part
+        self._file = open(  # pylint: disable=consider-using-with
+            self.current_path, "a", encoding="utf-8"
+        )
+        logger.debug(f"Rotated output into '{self.current_path}'")
+
+    def _flush_done(self, task: asyncio.Task) -> None:
+        """The `_flush_done` method keeps the error that stopped the flush task, if any, and drops the
+        records still queued so that nothing keeps waiting for them to be written.
+
+        """
+        if task.cancelled():
+            return
+        self._error = task.exception()
+        self._drop_queued()
+
+    def _drop_queued(self) -> None:
+        """The `_drop_queued` method empties the queue, marking every record as done."""
+        while not self._queue.empty():
+            self._queue.get_nowait()
+            self._queue.task_done()
+
+    def _raise_error(self) -> None:
+        """The `_raise_error` method raises the error that stopped the flush task, if it failed."""
+        if self._error is not None:
+            self._drop_queued()
+            raise self._error
+
+    async def _flush_loop(self) -> None:
+        """The `_flush_loop` coroutine writes the queued records in batches until it is cancelled."""
+        while True:
+            batch = [await self._queue.get()]
+            while not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+
+            try:
+                self._file.write("".join(json.dumps(r) + "\n" for r in batch))
+                self._file.flush()
+                self.records_written += len(batch)
+
+                if self.max_bytes and self._file.tell() >= self.max_bytes:
+                    await self._rotate()
+                elif time.monotonic() - self._last_fsync >= self.fsync_interval:
+                    await self._fsync()
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
@@ -0,0 +1,94 @@
+"""occurrence_benchmark.py measures the speedup of computing the occurrence reports with 1 to N workers.
+
+The reports of `write_all_occurrences` are computed once per number of workers on the same jobs, either
+a file written by the scraper or synthetic jobs, and every run is checked to give exactly the results of
+the serial run.
+
+Usage:
+
+    python occurrence_benchmark.py --path output/google_jobs_data.ndjson --workers 8
+    python occurrence_benchmark.py --jobs 20000 --workers 8
+"""
+
+import argparse
+import json
+import os
+import random
+import time
+
+from keyword_const import COMPUTER_SCIENCE_TERMS
+from parse_data import get_raw_data, occurrence_aggregator
+
+
+def make_jobs(count: int, seed: int = 0) -> list[dict]:
+    """The `make_jobs` function returns `count` synthetic jobs with descriptions of about 4 KB."""
+    rng = random.Random(seed)
+    filler = ["the", "and", "with", "team", "experience", "years", "build", "our"]
+    titles = [f"title {i}" for i in range(200)]
+    employers = [f"employer {i}" for i in range(1000)]
+    jobs = []
+    for _ in range(count):
+        words = [
+            (
+                rng.choice(COMPUTER_SCIENCE_TERMS)
+                if rng.random() < 0.1
+                else rng.choice(filler)
+            )
+            for _ in range(600)
+        ]
+        jobs.append(
+            {
+                "title": rng.choice(titles),
+                "employer": rng.choice(employers),
+                "job_description": " ".join(words[:500]),
+                "job_highlights": " ".join(words[500:]),
+            }
+        )
+    return jobs
+
+
+def parse_args():
+    """The `parse_args` function parses the jobs to benchmark on and the largest number of workers."""
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--path", help="File written by the scraper, synthetic jobs if omitted"
+    )
+    parser.add_argument(
+        "--jobs", default=10_000, type=int, help="Number of synthetic jobs"
+    )
+    parser.add_argument(
+        "--workers",
+        default=os.cpu_count(),
+        type=int,
+        help="Largest number of workers to time",
+    )
+    parser.add_argument(
+        "--chunk_size", default=500, type=int, help="Jobs sent to a worker at once"
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    """The `main` function times the reports for 1 to N workers and prints the speedup of each."""
+    args = parse_args()
+    data = get_raw_data(args.path) if args.path else make_jobs(args.jobs)
+
+    print("workers | seconds | speedup | identical")
+    serial = None
+    for workers in range(1, args.workers + 1):
+        start = time.perf_counter()
+        aggregator = occurrence_aggregator()
+        aggregator.consume(data, workers=workers, chunk_size=args.chunk_size)
+        # Compared as the JSON written to the report files, so key order counts too
+        results = json.dumps(aggregator.results(), indent=4)
+        seconds = time.perf_counter() - start
+        if serial is None:
+            serial = (seconds, results)
+        print(
+            f"{workers} | {seconds:.2f} | {serial[0] / seconds:.2f} | "
+            f"{results == serial[1]}"
+        )
+
+
+if __name__ == "__main__":
+    main()
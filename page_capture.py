@@ -0,0 +1,119 @@
+"""page_capture.py records scrolled Google jobs pages and replays them without touching the network.
+
+`PageRecorder` saves the HTML of every results page right after it has been scrolled, one file per query,
+plus a `captures.json` manifest mapping each query to its file. `PageReplayer` is installed as a request
+route on the crawl contexts and answers the Google search navigation of a query with its captured HTML,
+aborting every other request, so the whole scrape pipeline can run offline and deterministically.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+from pathlib import Path
+import re
+from urllib.parse import parse_qs, urlparse
+
+from playwright.async_api import BrowserContext, Page, Route
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "captures.json"
+
+# Scripts would only try to reach Google again when the capture is replayed
+script_pattern = re.compile(r"<script\b[^>]*>.*?</script>", re.IGNORECASE | re.DOTALL)
+
+
+def capture_file_name(query: str) -> str:
+    """The `capture_file_name` function turns a search query into a file name for its capture."""
+    return re.sub(r"[^a-z0-9]+", "_", query.lower()).strip("_") + ".html"
+
+
+def query_from_url(url: str) -> str | None:
+    """The `query_from_url` function returns the `q` parameter of a Google search URL, if any."""
+    values = parse_qs(urlparse(url).query).get("q")
+    return values[0] if values else None
+
+
+class PageRecorder:
+    """The `PageRecorder` class saves scrolled results pages into a capture directory.
+
+    Parameters
+    ----------
+    directory : str
+        The `directory` parameter is where the captures and their manifest are written. It is created if
+    needed, and captures of an earlier recording in the same directory are kept.
+
+    """
+
+    def __init__(self, directory: str) -> None:
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.manifest_path = self.directory.joinpath(MANIFEST_NAME)
+        self.manifest: dict[str, str] = {}
+        if self.manifest_path.exists():
+            self.manifest = json.loads(self.manifest_path.read_text(encoding="utf-8"))
+
+    async def save(self, page: Page, query: str) -> None:
+        """The `save` method writes the current HTML of `page` as the capture of `query`."""
+        self.save_html(await page.content(), query)
+
+    def save_html(self, page_html: str, query: str) -> None:
+        """The `save_html` method writes `page_html`, without its scripts, as the capture of `query`."""
+        html = script_pattern.sub("", page_html)
+        file_name = capture_file_name(query)
+        self.directory.joinpath(file_name).write_text(html, encoding="utf-8")
+
+        self.manifest[query] = file_name
+        self.manifest_path.write_text(
+            json.dumps(self.manifest, indent=4), encoding="utf-8"
+        )
+        logger.debug(f"Recorded `{query}` into '{file_name}'")
+
+
+class PageReplayer:
+    """The `PageReplayer` class serves captured pages to the browser in place of Google.
+
+    Parameters
+    ----------
+    directory : str
+        The `directory` parameter is a capture directory written by `PageRecorder`.
+
+    """
+
+    def __init__(self, directory: str) -> None:
+        self.directory = Path(directory)
+        manifest_path = self.directory.joinpath(MANIFEST_NAME)
+        self.manifest: dict[str, str] = json.loads(
+            manifest_path.read_text(encoding="utf-8")
+        )
+        self.served = 0
+        self.missing = 0
+
+    def has_capture(self, query: str) -> bool:
+        """The `has_capture` method tells whether a capture was recorded for `query`."""
+        return query in self.manifest
+
+    async def attach(self, context: BrowserContext) -> None:
+        """The `attach` method routes every request of `context` through the replayer."""
+        await context.route("**/*", self._handle_route)
+
+    async def _handle_route(self, route: Route) -> None:
+        """The `_handle_route` coroutine answers a document request with its capture, or a 404."""
+        request = route.request
+        if request.resource_type != "document":
+            await route.abort("blockedbyclient")
+            return
+
+        query = query_from_url(request.url)
+        if query is None or query not in self.manifest:
+            self.missing += 1
+            await route.fulfill(status=404, body="No capture recorded for this page")
+            return
+
+        self.served += 1
+        await route.fulfill(
+            status=200,
+            content_type="text/html; charset=utf-8",
+            path=self.directory.joinpath(self.manifest[query]),
+        )
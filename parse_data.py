@@ -1,17 +1,35 @@
 """parse_data.py is meant for parsing raw data that has already been scraped using the google_jobs_scraper.py script."""
 
+from __future__ import annotations
+
 import collections
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+import copy
+import gzip
+import itertools
 import json
 import logging
+import os
+from pathlib import Path
 
 from tqdm import tqdm
 from keyword_const import COMPUTER_SCIENCE_TERMS
+from keyword_matcher import KeywordMatcher
+from record_reader import RecordCursor, read_records
 
 logging.basicConfig()
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
+# Compiled once per process, worker processes included, then every description is matched in a single
+# pass whatever the number of terms
+COMPUTER_SCIENCE_MATCHER = KeywordMatcher(COMPUTER_SCIENCE_TERMS)
+
+# The counters behind the reports, saved next to them so that new jobs can be added without a full pass
+STATE_NAME = "occurrence_state.json.gz"
+
 
 def get_raw_data(path: str) -> list[dict]:
     """The function `get_raw_data` reads and returns the contents of a JSON file as a list of dictionaries.
@@ -20,15 +38,28 @@ def get_raw_data(path: str) -> list[dict]:
     ----------
     path : str
         The `path` parameter is a string that represents the file path of the JSON file that you want to
-    read.
+    read. Files ending in `.ndjson` or `.jsonl`, as written by the scraper, are read one record per line,
+    and `.gz` or `.zst` files are decompressed.
 
     Returns
     -------
         a list of dictionaries.
 
     """
-    with open(path, "r", encoding="utf-8") as file:
-        return json.load(file)
+    return list(read_records(path))
+
+
+def iter_raw_data(path: str) -> Iterator[dict]:
+    """The function `iter_raw_data` yields the records of the same files as `get_raw_data` one at a time,
+    so that memory stays flat however large the file is. Every report function accepts its result.
+
+    Parameters
+    ----------
+    path : str
+        The `path` parameter is the file path of a JSON array or NDJSON file, optionally compressed.
+
+    """
+    return read_records(path)
 
 
 def write_data(data: list or dict, path: str) -> None:
@@ -60,15 +91,15 @@ def strip_non_computer_word(tokens: list[str]):
     Returns:
         list: A list of tokens that are computer science terms.
     """
-    return [token for token in tokens if token in COMPUTER_SCIENCE_TERMS]
+    return COMPUTER_SCIENCE_MATCHER.find(" ".join(tokens))
 
 
-def get_occurrences(data: list[dict], col_name: str) -> list:
+def get_occurrences(data: Iterable[dict], col_name: str) -> list:
     """
     Returns a list of tuples containing the frequency of occurrence of each unique value in the specified column of the input data.
 
     Args:
-        data (list): A list of dictionaries representing job data.
+        data (Iterable[dict]): Dictionaries representing job data.
         col_name (str): The name of the column to analyze.
 
     Returns:
@@ -89,29 +120,26 @@ def get_keywords(job_dict: dict) -> list:
     """
     Extracts keywords from the job description and highlights of a job listing.
 
+    Multi-word terms ("machine learning") are found as well as single words, and punctuation attached to
+    a word ("python,") does not hide it.
+
     Args:
         job_dict (dict): A dictionary containing job listing information.
 
     Returns:
         list: A list of keywords extracted from the job description and highlights.
     """
-    word_string = " ".join(
-        [
-            job_dict["job_description"].lower(),
-            job_dict["job_highlights"].lower(),
-        ]
-    )
-    word_list = word_string.split()
-    return strip_non_computer_word(word_list)
+    word_string = " ".join([job_dict["job_description"], job_dict["job_highlights"]])
+    return COMPUTER_SCIENCE_MATCHER.find(word_string)
 
 
-def job_title_keywords(data: list[dict]) -> dict[str, list[tuple]]:
+def job_title_keywords(data: Iterable[dict]) -> dict[str, list[tuple]]:
     """
     Given a list of job dictionaries, returns a dictionary where each key is a job title and the value is a list of tuples
     containing the top N number of skills associated with that title, sorted by frequency of occurrence.
 
     Args:
-        data (list[dict]): A list of job dictionaries containing job titles, descriptions, and highlights.
+        data (Iterable[dict]): Job dictionaries containing job titles, descriptions, and highlights.
 
     Returns:
         dict[str, list[tuple]]: A dictionary where each key is a job title and the value is a list of tuples containing
@@ -141,12 +169,12 @@ def job_title_keywords(data: list[dict]) -> dict[str, list[tuple]]:
     return result
 
 
-def employer_keywords(data: list[dict]) -> dict:
+def employer_keywords(data: Iterable[dict]) -> dict:
     """
     Extracts the keywords from the job descriptions in the given data and groups them by employer.
 
     Args:
-        data (list): A list of dictionaries, where each dictionary represents a job posting and contains
+        data (Iterable[dict]): Dictionaries, where each dictionary represents a job posting and contains
             the following keys: "title", "location", "employer", "description", "date_posted".
 
     Returns:
@@ -170,15 +198,15 @@ def employer_keywords(data: list[dict]) -> dict:
     return result
 
 
-def all_job_title_occurrences(data: list[dict], path: str) -> None:
+def all_job_title_occurrences(data: Iterable[dict], path: str) -> None:
     """The function `all_job_title_occurrences` takes a list of dictionaries `data` and a string `path` as
     input, counts the occurrences of job titles in the `data` and writes the result to a file specified
     by `path`.
 
     Parameters
     ----------
-    data : list[dict]
-        The `data` parameter is a list of dictionaries. Each dictionary represents a job and contains
+    data : Iterable[dict]
+        The `data` parameter is an iterable of dictionaries. Each dictionary represents a job and contains
     information about the job, such as the job title, company, and location.
     path : str
         The `path` parameter is a string that represents the file path where the result will be written to.
@@ -186,19 +214,17 @@ def all_job_title_occurrences(data: list[dict], path: str) -> None:
     file named "job_titles.txt" in the current directory, you can set `path`
 
     """
-    job_titles = get_occurrences(data, "title")
-    result = {elem[0]: elem[1] for elem in job_titles}
-    write_data(result, path)
+    write_report(data, ColumnOccurrences("title"), path)
 
 
-def all_employer_keyword_occurrences(data: list[dict], path: str) -> None:
+def all_employer_keyword_occurrences(data: Iterable[dict], path: str) -> None:
     """The function `all_employer_keyword_occurrences` extracts the occurrences of keywords for each
     employer from a given dataset, and writes the results to a specified file path.
 
     Parameters
     ----------
-    data : list[dict]
-        The `data` parameter is a list of dictionaries. Each dictionary represents a data entry and
+    data : Iterable[dict]
+        The `data` parameter is an iterable of dictionaries. Each dictionary represents a data entry and
     contains information about an employer. The dictionaries have various keys, but one of the keys is
     "employer" which contains the name of the employer.
     path : str
@@ -206,42 +232,35 @@ def all_employer_keyword_occurrences(data: list[dict], path: str) -> None:
     It should include the file name and extension. For example, "output.txt" or "results.csv".
 
     """
-    employers = get_occurrences(data, "employer")
-    emp_keywords = employer_keywords(data)
-    result = {emp_name: dict(emp_keywords[emp_name]) for (emp_name, count) in employers}
-    write_data(result, path)
+    write_report(data, ColumnKeywordOccurrences("employer"), path)
 
 
-def all_job_title_keyword_occurrences(data: list[dict], path: str) -> None:
+def all_job_title_keyword_occurrences(data: Iterable[dict], path: str) -> None:
     """The function `all_job_title_keyword_occurrences` takes in a list of dictionaries representing job
     data and a file path, and it calculates the occurrences of keywords in job titles and writes the
     results to a file.
 
     Parameters
     ----------
-    data : list[dict]
-        The `data` parameter is a list of dictionaries. Each dictionary represents a job and contains
+    data : Iterable[dict]
+        The `data` parameter is an iterable of dictionaries. Each dictionary represents a job and contains
     information such as the job title, description, and other relevant details.
     path : str
         The `path` parameter is a string that represents the file path where the result will be written to.
 
     """
-    job_titles = get_occurrences(data, "title")
-    jt_keywords = job_title_keywords(data)
-    result = {title: dict(jt_keywords[title]) for (title, count) in job_titles}
-
-    write_data(result, path)
+    write_report(data, ColumnKeywordOccurrences("title"), path)
 
 
-def all_employer_occurrences(data: list[dict], path: str) -> None:
+def all_employer_occurrences(data: Iterable[dict], path: str) -> None:
     """The function `all_employer_occurrences` takes a list of dictionaries `data` and a string `path` as
     input, counts the occurrences of each employer in the data, and writes the result to a file
     specified by the `path`.
 
     Parameters
     ----------
-    data : list[dict]
-        The `data` parameter is a list of dictionaries. Each dictionary represents a data entry and
+    data : Iterable[dict]
+        The `data` parameter is an iterable of dictionaries. Each dictionary represents a data entry and
     contains information about an individual. The dictionaries have various keys, but one of the keys is
     "employer" which stores the name of the employer for that individual.
     path : str
@@ -250,30 +269,353 @@ def all_employer_occurrences(data: list[dict], path: str) -> None:
     file named "output.txt" in the current directory, you can pass the value "./output
 
     """
-    employers = get_occurrences(data, "employer")
-    result = {elem[0]: elem[1] for elem in employers}
+    write_report(data, ColumnOccurrences("employer"), path)
 
-    write_data(result, path)
 
+class ColumnOccurrences:
+    """The `ColumnOccurrences` report counts the jobs of every value of a column, such as every title.
+
+    Parameters
+    ----------
+    col_name : str
+        The `col_name` parameter is the name of the column to count, its values are stripped and lowercased.
+
+    """
+
+    uses_keywords = False
+
+    def __init__(self, col_name: str) -> None:
+        self.col_name = col_name
+        self.counts = collections.Counter()
+
+    def add(self, job_dict: dict, _keywords: list[str] | None) -> None:
+        """The `add` method counts one job, the column does not depend on its keywords."""
+        self.counts[job_dict[self.col_name].strip().lower()] += 1
+
+    def merge(self, other: "ColumnOccurrences") -> None:
+        """The `merge` method adds the counts of a report of the jobs that follow this report's jobs."""
+        self.counts.update(other.counts)
+
+    def state(self) -> dict:
+        """The `state` method returns the counters of the report as JSON serializable data."""
+        return {"counts": self.counts}
+
+    def restore(self, state: dict) -> None:
+        """The `restore` method replaces the counters of the report with a saved `state`."""
+        self.counts = collections.Counter(state["counts"])
+
+    def result(self) -> dict[str, int]:
+        """The `result` method returns the count of every value, most frequent first."""
+        return dict(self.counts.most_common())
+
+
+class ColumnKeywordOccurrences(ColumnOccurrences):
+    """The `ColumnKeywordOccurrences` report counts the keywords of the jobs of every value of a column.
+
+    Values are ordered by their number of jobs, and the keywords of every value by their frequency.
+
+    """
 
-def write_all_occurrences(data: list[dict], path: str) -> None:
-    # sourcery skip: use-fstring-for-concatenation
+    uses_keywords = True
+
+    def __init__(self, col_name: str) -> None:
+        super().__init__(col_name)
+        self.keywords: dict[str, collections.Counter] = {}
+
+    def add(self, job_dict: dict, keywords: list[str] | None) -> None:
+        """The `add` method counts one job and its keywords."""
+        value = job_dict[self.col_name].strip().lower()
+        self.counts[value] += 1
+        self.keywords.setdefault(value, collections.Counter()).update(keywords)
+
+    def merge(self, other: "ColumnKeywordOccurrences") -> None:
+        """The `merge` method adds the counts of a report of the jobs that follow this report's jobs."""
+        super().merge(other)
+        for value, keywords in other.keywords.items():
+            self.keywords.setdefault(value, collections.Counter()).update(keywords)
+
+    def state(self) -> dict:
+        """The `state` method returns the counters of the report as JSON serializable data."""
+        return {"counts": self.counts, "keywords": self.keywords}
+
+    def restore(self, state: dict) -> None:
+        """The `restore` method replaces the counters of the report with a saved `state`."""
+        super().restore(state)
+        self.keywords = {
+            value: collections.Counter(keywords)
+            for value, keywords in state["keywords"].items()
+        }
+
+    def result(self) -> dict[str, dict[str, int]]:
+        """The `result` method returns the keyword counts of every value."""
+        return {
+            value: dict(self.keywords[value].most_common())
+            for value, _ in self.counts.most_common()
+        }
+
+
+class OccurrenceAggregator:
+    """The `OccurrenceAggregator` class computes any number of reports in a single pass over the jobs.
+
+    A report is any object with an `add(job_dict, keywords)` method, a `merge(other)` method, a `result()`
+    method and a `uses_keywords` attribute. The keywords of a job are extracted once and shared by every
+    report that uses them, so registering one more report does not add another scan of the data.
+
+    Reports are merged in the order of the jobs, and counters keep the order keys were first seen in, so
+    the results of a parallel pass are identical to the results of a serial one, ties included. Reports
+    with `state()` and `restore(state)` methods can be saved and loaded back to add more jobs later.
+
+    """
+
+    def __init__(self) -> None:
+        self.reports = {}
+        self.jobs = 0
+        # The `RecordCursor` state of every input file counted, so that it is not counted twice
+        self.inputs: dict[str, dict] = {}
+
+    def register(self, name: str, report):
+        """The `register` method adds a report under `name`, which is also its file name, and returns it."""
+        if name in self.reports:
+            raise ValueError(f"A report named '{name}' is already registered")
+        self.reports[name] = report
+        return report
+
+    def add(self, job_dict: dict) -> None:
+        """The `add` method passes one job to every registered report."""
+        keywords = None
+        if any(report.uses_keywords for report in self.reports.values()):
+            keywords = get_keywords(job_dict)
+        for report in self.reports.values():
+            report.add(job_dict, keywords)
+        self.jobs += 1
+
+    def merge(self, other: "OccurrenceAggregator") -> None:
+        """The `merge` method adds the reports of an aggregator of the jobs that follow this one's jobs."""
+        for name, report in self.reports.items():
+            report.merge(other.reports[name])
+        self.jobs += other.jobs
+
+    def consume(
+        self, data: Iterable[dict], workers: int = 1, chunk_size: int = 500
+    ) -> "OccurrenceAggregator":
+        """The `consume` method passes every job of `data` to the reports and returns the aggregator.
+
+        Parameters
+        ----------
+        data : Iterable[dict]
+            The `data` parameter holds the jobs to count.
+        workers : int
+            The `workers` parameter is the number of processes extracting keywords. With more than one,
+        `data` is cut into chunks that are counted by separate copies of the reports, which are then merged
+        in order. The reports must be picklable and still empty.
+        chunk_size : int
+            The `chunk_size` parameter is the number of jobs sent to a worker at once.
+
+        """
+        if workers <= 1:
+            for job_dict in tqdm(data, desc="Counting Occurrences"):
+                self.add(job_dict)
+            return self
+
+        if self.jobs:
+            raise ValueError("Only an empty aggregator can consume jobs in parallel")
+        pending = collections.deque()
+        # The empty reports are pickled once per worker, not once per chunk
+        with ProcessPoolExecutor(
+            workers, initializer=_init_worker, initargs=(self,)
+        ) as executor, tqdm(desc="Counting Occurrences", unit="it") as progress:
+
+            def merge_oldest() -> None:
+                partial = pending.popleft().result()
+                self.merge(partial)
+                progress.update(partial.jobs)
+
+            for chunk in _chunks(data, chunk_size):
+                # Results are merged in submission order, with a bounded number of chunks in flight
+                if len(pending) >= 2 * workers:
+                    merge_oldest()
+                pending.append(executor.submit(_consume_chunk, chunk))
+            while pending:
+                merge_oldest()
+        return self
+
+    def results(self) -> dict[str, dict]:
+        """The `results` method returns the result of every report by name."""
+        return {name: report.result() for name, report in self.reports.items()}
+
+    def write(self, path: str) -> None:
+        """The `write` method writes every report to `<path>/<name>.json`."""
+        for name, result in self.results().items():
+            write_data(result, f"{path}/{name}.json")
+
+    def save(self, path: str) -> None:
+        """The `save` method writes the counters of every report and the input files read to `path`,
+        compressed with gzip.
+
+        """
+        state = {
+            "jobs": self.jobs,
+            "inputs": self.inputs,
+            "reports": {name: report.state() for name, report in self.reports.items()},
+        }
+        tmp_path = f"{path}.tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as file:
+            json.dump(state, file, separators=(",", ":"))
+        os.replace(tmp_path, path)
+
+    def load(self, path: str) -> "OccurrenceAggregator":
+        """The `load` method restores the registered reports from a state written by `save`.
+
+        Raises
+        ------
+        ValueError
+            If a registered report has no saved state, its counters would miss the jobs already counted, or
+        if the state does not record the input files counted.
+
+        """
+        with gzip.open(path, "rt", encoding="utf-8") as file:
+            state = json.load(file)
+
+        missing = set(self.reports) - set(state["reports"])
+        if missing:
+            raise ValueError(
+                f"'{path}' has no state for {sorted(missing)}, build the reports again"
+            )
+        if "inputs" not in state:
+            raise ValueError(
+                f"'{path}' does not tell which files were counted, build the reports again"
+            )
+        for name, report in self.reports.items():
+            report.restore(state["reports"][name])
+        self.jobs = state["jobs"]
+        self.inputs = state["inputs"]
+        return self
+
+
+def _chunks(data: Iterable[dict], size: int):
+    """The `_chunks` function yields the jobs of `data` in lists of `size` jobs."""
+    jobs = iter(data)
+    while chunk := list(itertools.islice(jobs, size)):
+        yield chunk
+
+
+_worker_template: OccurrenceAggregator | None = None
+
+
+def _init_worker(template: OccurrenceAggregator) -> None:
+    """The `_init_worker` function keeps the empty aggregator every chunk of the worker is counted into."""
+    global _worker_template  # pylint: disable=global-statement
+    _worker_template = template
+
+
+def _consume_chunk(chunk: list[dict]) -> OccurrenceAggregator:
+    """The `_consume_chunk` function counts `chunk` into a copy of the worker's empty aggregator."""
+    aggregator = copy.deepcopy(_worker_template)
+    for job_dict in chunk:
+        aggregator.add(job_dict)
+    return aggregator
+
+
+def write_report(data: Iterable[dict], report, path: str) -> None:
+    """The `write_report` function computes one report in a single pass and writes it to `path`."""
+    aggregator = OccurrenceAggregator()
+    aggregator.register("report", report)
+    aggregator.consume(data)
+    write_data(report.result(), path)
+
+
+def occurrence_aggregator() -> OccurrenceAggregator:
+    """The `occurrence_aggregator` function returns an aggregator with the reports of
+    `write_all_occurrences` registered.
+
+    """
+    aggregator = OccurrenceAggregator()
+    aggregator.register("job_title_occurrences", ColumnOccurrences("title"))
+    aggregator.register(
+        "employer_keyword_occurrences", ColumnKeywordOccurrences("employer")
+    )
+    aggregator.register(
+        "job_title_keyword_occurrences", ColumnKeywordOccurrences("title")
+    )
+    aggregator.register("employer_occurrences", ColumnOccurrences("employer"))
+    return aggregator
+
+
+def write_all_occurrences(data: Iterable[dict], path: str, workers: int = 1) -> None:
     """The function writes all occurrences of job titles, employer keywords, job title keywords, and
-    employers from a given data list to a specified file path.
+    employers from a given data list to a specified file path. Every report is computed in the same pass
+    over `data`, with the keywords of each job extracted once.
 
     Parameters
     ----------
-    data : list[dict]
+    data : Iterable[dict]
         A list of dictionaries representing job data. Each dictionary contains information about a job,
     such as job title, employer, and keywords.
     path : str
         The path parameter is a string that represents the file path where the occurrences will be written to.
+    workers : int
+        The `workers` parameter is the number of processes extracting keywords, the files written are the
+    same for any number.
 
     """
+    aggregator = occurrence_aggregator().consume(data, workers=workers)
+    aggregator.write(path)
+    aggregator.save(f"{path}/{STATE_NAME}")
 
-    all_job_title_occurrences(data, path + "/job_title_occurrences.json")
-    all_employer_keyword_occurrences(data, path + "/employer_keyword_occurrences.json")
-    all_job_title_keyword_occurrences(
-        data, path + "/job_title_keyword_occurrences.json"
+
+def update_occurrences(
+    paths: list[str], path: str, workers: int = 1, rebuild: bool = False
+) -> int:
+    """The function `update_occurrences` adds the jobs of `paths` to the reports saved in `path` and
+    writes the reports again, in time proportional to the new jobs rather than to every job counted.
+
+    Parameters
+    ----------
+    paths : list[str]
+        The `paths` parameter holds the files of jobs to add. Plain NDJSON files written by the scraper are
+    only read from where the previous update stopped, so the same growing file can be passed every day.
+    Other files are only added the first time they are passed.
+    path : str
+        The `path` parameter is the directory holding the reports and their saved state.
+    workers : int
+        The `workers` parameter is the number of processes extracting keywords.
+    rebuild : bool
+        The `rebuild` parameter ignores the saved state and counts every job of `paths` from the start.
+
+    Returns
+    -------
+        The number of jobs added.
+
+    Raises
+    ------
+    ValueError
+        If a file counted before was rewritten, and the reports have to be built again with `rebuild`.
+
+    """
+    state_path = f"{path}/{STATE_NAME}"
+    aggregator = occurrence_aggregator()
+    if not rebuild and Path(state_path).exists():
+        aggregator.load(state_path)
+    elif not rebuild:
+        logger.info(f"No saved state in '{path}', counting every job")
+
+    # Every file is checked before any job is counted, so a rejected update leaves the state as it was
+    cursors = {
+        str(Path(data_path).resolve()): RecordCursor(
+            data_path, aggregator.inputs.get(str(Path(data_path).resolve()))
+        )
+        for data_path in paths
+    }
+    # The new jobs are counted apart, so that they can be counted in parallel, and added afterwards
+    new_jobs = occurrence_aggregator().consume(
+        itertools.chain.from_iterable(cursors.values()), workers=workers
     )
-    all_employer_occurrences(data, path + "/employer_occurrences.json")
+    for key, cursor in cursors.items():
+        aggregator.inputs[key] = cursor.state
+
+    if new_jobs.jobs or rebuild:
+        aggregator.merge(new_jobs)
+        aggregator.write(path)
+    aggregator.save(state_path)
+    logger.info(f"Added {new_jobs.jobs} jobs, the reports count {aggregator.jobs} jobs")
+    return new_jobs.jobs
@@ -0,0 +1,196 @@
+"""record_reader.py streams the job records of a scraped file one at a time, whatever its size.
+
+`read_records` reads a top-level JSON array incrementally instead of loading it whole, reads NDJSON line
+by line, and decompresses `.gz` and `.zst` files on the fly, so only one record and one read buffer are in
+memory at any time. Reading `.zst` files needs the optional `zstandard` package.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterator
+import gzip
+import hashlib
+import json
+from pathlib import Path
+from typing import TextIO
+
+try:
+    import zstandard
+except ImportError:  # Only needed for .zst files
+    zstandard = None
+
+READ_SIZE = 1 << 20
+# Bytes before the offset reached in an NDJSON file that are hashed to notice the file was rewritten
+TAIL_SIZE = 4096
+
+_decoder = json.JSONDecoder()
+_whitespace = " \t\n\r"
+
+
+def open_text(path: str) -> TextIO:
+    """The `open_text` function opens a file as text, decompressing `.gz` and `.zst` files on the fly."""
+    suffix = Path(path).suffix.lower()
+    if suffix == ".gz":
+        return gzip.open(path, "rt", encoding="utf-8")
+    if suffix in {".zst", ".zstd"}:
+        if zstandard is None:
+            raise RuntimeError(f"Reading '{path}' needs the zstandard package")
+        return zstandard.open(path, "rt", encoding="utf-8")
+    return open(path, "r", encoding="utf-8")
+
+
+def iter_json_values(file: TextIO, read_size: int = READ_SIZE) -> Iterator:
+    """The `iter_json_values` function yields the items of a top-level JSON array, or the values of a
+    stream of concatenated JSON values, reading `file` `read_size` characters at a time.
+
+    Parameters
+    ----------
+    file : TextIO
+        The `file` parameter is the text stream to decode.
+    read_size : int
+        The `read_size` parameter is the number of characters read at once. A value longer than that is
+    read in as many reads as it needs.
+
+    """
+    buffer = ""
+    position = 0
+    eof = False
+    in_array = None
+
+    while True:
+        # Skip what separates values: whitespace, and the brackets and commas of the array
+        while position < len(buffer) and (
+            buffer[position] in _whitespace or (in_array and buffer[position] == ",")
+        ):
+            position += 1
+        if position < len(buffer):
+            if in_array is None:
+                in_array = buffer[position] == "["
+                if in_array:
+                    position += 1
+                continue
+            if in_array and buffer[position] == "]":
+                return
+
+            try:
+                value, end = _decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                end = None
+            # A value reaching the end of the buffer may go on in the next read, e.g. a number
+            if end is not None and (end < len(buffer) or eof):
+                yield value
+                position = end
+                continue
+        elif eof:
+            if in_array:
+                raise json.JSONDecodeError("Unterminated array", buffer, position)
+            return
+
+        chunk = file.read(read_size)
+        eof = not chunk
+        buffer = buffer[position:] + chunk
+        position = 0
+
+
+def read_records(path: str) -> Iterator[dict]:
+    """The `read_records` function yields the records of a file written by the scraper, one at a time.
+
+    Parameters
+    ----------
+    path : str
+        The `path` parameter is a JSON file holding an array of records, or an NDJSON file (`.ndjson` or
+    `.jsonl`) with one record per line, optionally compressed with gzip (`.gz`) or zstd (`.zst`).
+
+    """
+    name = Path(path).name.lower()
+    for suffix in (".gz", ".zst", ".zstd"):
+        name = name.removesuffix(suffix)
+
+    with open_text(path) as file:
+        if name.endswith((".ndjson", ".jsonl")):
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from iter_json_values(file)
+
+
+class RecordCursor:
+    """The `RecordCursor` class reads the records of a file that were not read by a previous run.
+
+    Plain NDJSON files written by the scraper only grow, so the cursor reads them from the byte offset the
+    previous run stopped at. To notice a file rewritten since then, such as an output cut back by
+    `--resume`, the state also keeps a hash of the bytes just before that offset. Any other file is read
+    whole the first time only, and recognized afterwards by its size and modification time.
+
+    Parameters
+    ----------
+    path : str
+        The `path` parameter is the file to read, in any format `read_records` reads.
+    state : dict | None
+        The `state` parameter is the `state` of the cursor of the previous run on the same file, or None
+    if the file was never read.
+
+    Raises
+    ------
+    ValueError
+        If the file changed in a way that cannot be read as an addition to what was read before.
+
+    """
+
+    def __init__(self, path: str, state: dict | None = None) -> None:
+        self.path = path
+        self.appendable = Path(path).suffix.lower() in {".ndjson", ".jsonl"}
+        self.offset = 0
+        self.done = False
+        stat = Path(path).stat()
+
+        if state is None:
+            return
+        if not self.appendable:
+            if state.get("size") != stat.st_size or (
+                state.get("mtime_ns") != stat.st_mtime_ns
+            ):
+                raise ValueError(
+                    f"'{path}' changed since it was counted and cannot be appended to"
+                )
+            self.done = True
+            return
+        offset = state.get("offset", 0)
+        if stat.st_size < offset or state.get("tail") != self._tail_hash(offset):
+            raise ValueError(f"'{path}' was rewritten since it was counted")
+        self.offset = offset
+
+    def _tail_hash(self, offset: int) -> str:
+        """The `_tail_hash` method hashes the bytes of the file just before `offset`."""
+        start = max(0, offset - TAIL_SIZE)
+        with open(self.path, "rb") as file:
+            file.seek(start)
+            return hashlib.sha1(file.read(offset - start)).hexdigest()
+
+    @property
+    def state(self) -> dict:
+        """The `state` property is what the next run needs to read only what this one did not."""
+        if self.appendable:
+            return {"offset": self.offset, "tail": self._tail_hash(self.offset)}
+        stat = Path(self.path).stat()
+        return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+    def __iter__(self) -> Iterator[dict]:
+        if self.done:
+            return
+        if not self.appendable:
+            yield from read_records(self.path)
+            return
+
+        with open(self.path, "rb") as file:
+            file.seek(self.offset)
+            for line in file:
+                if not line.endswith(b"\n"):
+                    # Still being written, it is read in full on the next run
+                    break
+                self.offset += len(line)
+                if line.strip():
+                    yield json.loads(line)
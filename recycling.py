@@ -0,0 +1,115 @@
+"""recycling.py decides when crawl contexts and the browser are replaced to stop memory from creeping up.
+
+Browsers hold on to memory over a long sweep: caches, leaked documents and fragmented heaps only grow,
+until a page stalls or the process is killed. `RecyclePolicy` is asked after every task whether the
+context that ran it has served enough pages, whether the browser uses too much memory per context, or
+whether the browser as a whole is over its limit, and keeps count of what it recycled. A relaunched
+browser is given a number of tasks to settle before it can be relaunched again, so a limit set below
+what the browser needs does not turn into a relaunch after every task.
+"""
+
+from __future__ import annotations
+
+import logging
+
+from crawl_metrics import browser_usage
+
+logger = logging.getLogger(__name__)
+
+CONTEXT = "context"
+BROWSER = "browser"
+
+
+class RecyclePolicy:
+    """The `RecyclePolicy` class tells the `CrawlScheduler` when to replace a context or the browser.
+
+    Parameters
+    ----------
+    context_pages : int
+        The `context_pages` parameter is the number of tasks after which a context is replaced. 0 disables
+    the limit.
+    context_mb : float
+        The `context_mb` parameter is the browser RSS per open context, in MB, above which the context that
+    just finished a task is replaced. 0 disables the limit.
+    browser_mb : float
+        The `browser_mb` parameter is the RSS of the whole browser, in MB, above which the browser is
+    relaunched. 0 disables the limit.
+    browser_min_pages : int
+        The `browser_min_pages` parameter is the number of tasks the browser has to run after a launch
+    before it can be relaunched.
+
+    """
+
+    def __init__(
+        self,
+        context_pages: int = 0,
+        context_mb: float = 0.0,
+        browser_mb: float = 0.0,
+        browser_min_pages: int = 10,
+    ) -> None:
+        self.context_pages = context_pages
+        self.context_mb = context_mb
+        self.browser_mb = browser_mb
+        self.browser_min_pages = browser_min_pages
+        self.context_recycles = 0
+        self.browser_recycles = 0
+        self.browser_pages = 0
+        self.high_water_mb = 0.0
+        self._warned_unreachable = False
+
+    def check(self, pages: int, contexts: int) -> str | None:
+        """The `check` method decides what to recycle after a context finished a task.
+
+        Parameters
+        ----------
+        pages : int
+            The `pages` parameter is the number of tasks the context has run so far.
+        contexts : int
+            The `contexts` parameter is the number of contexts currently open on the browser.
+
+        Returns
+        -------
+            `BROWSER` to relaunch the browser, `CONTEXT` to replace the context, or None.
+
+        """
+        self.browser_pages += 1
+        rss_mb = None
+        if self.context_mb or self.browser_mb:
+            usage = browser_usage()
+            if usage is not None:
+                rss_mb = usage["rss_mb"]
+                self.high_water_mb = max(self.high_water_mb, rss_mb)
+
+        if rss_mb is not None and self.browser_mb and rss_mb > self.browser_mb:
+            if self.browser_pages >= self.browser_min_pages:
+                logger.info(f"Browser uses {rss_mb} MB, relaunching it")
+                return BROWSER
+            if self.browser_recycles and not self._warned_unreachable:
+                self._warned_unreachable = True
+                logger.warning(
+                    f"Browser uses {rss_mb} MB {self.browser_pages} tasks after a relaunch, a "
+                    f"{self.browser_mb} MB limit looks unreachable with {contexts} contexts"
+                )
+        if self.context_pages and pages >= self.context_pages:
+            return CONTEXT
+        if (
+            rss_mb is not None
+            and self.context_mb
+            and rss_mb / max(1, contexts) > self.context_mb
+        ):
+            logger.debug(f"Browser uses {rss_mb} MB for {contexts} contexts")
+            return CONTEXT
+        return None
+
+    def relaunched(self) -> None:
+        """The `relaunched` method counts a browser relaunch and starts its settling period."""
+        self.browser_recycles += 1
+        self.browser_pages = 0
+
+    def summary(self) -> dict:
+        """The `summary` method returns the recycle counts and the highest browser RSS sampled."""
+        return {
+            "context_recycles": self.context_recycles,
+            "browser_recycles": self.browser_recycles,
+            "browser_high_water_mb": self.high_water_mb,
+        }
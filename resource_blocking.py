@@ -0,0 +1,120 @@
+"""resource_blocking.py aborts the requests the scraper does not need before the browser downloads them.
+
+The scraper only reads text from a few XPaths, so images, fonts, media and tracking beacons are wasted
+bandwidth and page-ready time. A `ResourceBlocker` is attached to every browser context with
+`BrowserContext.route` and drops requests by resource type and URL pattern according to a named profile.
+"""
+
+import logging
+import re
+
+from playwright.async_api import BrowserContext, Request, Route
+from playwright.async_api import Error as PlaywrightError
+
+logger = logging.getLogger(__name__)
+
+TRACKING_PATTERNS = (
+    r"google-analytics\.com",
+    r"googletagmanager\.com",
+    r"doubleclick\.net",
+    r"googleadservices\.com",
+    r"adservice\.google\.",
+    r"/gen_204",
+    r"/client_204",
+    r"/log\?",
+)
+
+BLOCKING_PROFILES = {  # pylint: disable=consider-using-namedtuple-or-dataclass
+    "none": {"resource_types": set(), "url_patterns": ()},
+    "minimal": {
+        "resource_types": {"image", "media", "font"},
+        "url_patterns": TRACKING_PATTERNS,
+    },
+    "text-only": {
+        "resource_types": {
+            "image",
+            "media",
+            "font",
+            "stylesheet",
+            "texttrack",
+            "manifest",
+            "websocket",
+            "eventsource",
+            "other",
+        },
+        "url_patterns": TRACKING_PATTERNS,
+    },
+}
+
+
+class ResourceBlocker:
+    """The `ResourceBlocker` class aborts requests matching a blocking profile and counts them.
+
+    Parameters
+    ----------
+    profile : str
+        The `profile` parameter is the name of the entry of `BLOCKING_PROFILES` to apply. `minimal` drops
+    images, media, fonts and tracking beacons, `text-only` also drops stylesheets and other non-script
+    resources, and `none` lets everything through.
+
+    """
+
+    def __init__(self, profile: str = "minimal") -> None:
+        self.profile = profile
+        self.resource_types = BLOCKING_PROFILES[profile]["resource_types"]
+        self.url_pattern = re.compile(
+            "|".join(BLOCKING_PROFILES[profile]["url_patterns"]) or "$^"
+        )
+        self.blocked_requests = 0
+        self.blocked_by_type: dict[str, int] = {}
+        self.allowed_requests = 0
+        self.allowed_bytes = 0
+
+    def is_blocked(self, resource_type: str, url: str) -> bool:
+        """The `is_blocked` method tells whether a request of `resource_type` to `url` must be aborted."""
+        return resource_type in self.resource_types or bool(
+            self.url_pattern.search(url)
+        )
+
+    async def attach(self, context: BrowserContext) -> None:
+        """The `attach` method installs the traffic counter and, unless the profile is `none`, the
+        blocking route on `context`.
+
+        """
+        context.on("requestfinished", self._count_request)
+        if self.profile != "none":
+            await context.route("**/*", self._handle_route)
+
+    async def _handle_route(self, route: Route) -> None:
+        """The `_handle_route` coroutine aborts a blocked request and lets any other one through."""
+        request = route.request
+        if self.is_blocked(request.resource_type, request.url):
+            self.blocked_requests += 1
+            self.blocked_by_type[request.resource_type] = (
+                self.blocked_by_type.get(request.resource_type, 0) + 1
+            )
+            await route.abort("blockedbyclient")
+            return
+        await route.continue_()
+
+    async def _count_request(self, request: Request) -> None:
+        """The `_count_request` coroutine counts a finished request and the body bytes it received."""
+        # Aborted requests never finish, so only the traffic that was still downloaded is counted. The body
+        # size is what went over the wire, which chunked and compressed responses do not announce
+        try:
+            sizes = await request.sizes()
+        except PlaywrightError:
+            # The context was closed before the sizes could be read
+            return
+        self.allowed_requests += 1
+        self.allowed_bytes += max(sizes["responseBodySize"], 0)
+
+    def summary(self) -> dict:
+        """The `summary` method returns the blocking counters as a dictionary."""
+        return {
+            "profile": self.profile,
+            "blocked_requests": self.blocked_requests,
+            "blocked_by_type": self.blocked_by_type,
+            "allowed_requests": self.allowed_requests,
+            "allowed_bytes": self.allowed_bytes,
+        }
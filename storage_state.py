@@ -0,0 +1,61 @@
+"""storage_state.py carries cookies and local storage over from one browser context to the next.
+
+Every pooled context normally starts empty, so each one pays for the Google consent flow and cookie
+setup again. `StorageState` saves the `storage_state` of a context to a JSON file when the context is
+closed and seeds every new context with it, within a crawl and across crawls.
+"""
+
+import json
+import logging
+import os
+from pathlib import Path
+
+from playwright.async_api import BrowserContext
+
+logger = logging.getLogger(__name__)
+
+
+class StorageState:
+    """The `StorageState` class loads and saves the storage state shared by all crawl contexts.
+
+    Parameters
+    ----------
+    path : str
+        The `path` parameter is the JSON file holding the cookies and local storage of the last context
+    that was closed. It does not need to exist yet.
+
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = Path(path)
+        self.warm = self.path.is_file()
+        self.saves = 0
+
+    def context_options(self) -> dict:
+        """The `context_options` method returns the `new_context` options that restore the saved state."""
+        if not self.path.is_file():
+            return {}
+        return {"storage_state": str(self.path)}
+
+    async def save(self, context: BrowserContext) -> None:
+        """The `save` method writes the current storage state of `context` to `path`.
+
+        The state is written to a temporary file first and then renamed, so a context closed at the same
+        time or a crash never leaves a half written file behind.
+
+        """
+        try:
+            state = await context.storage_state()
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            # A crashed context has no state worth keeping
+            logger.debug(f"Could not read storage state: {e}")
+            return
+
+        tmp_path = self.path.with_name(f"{self.path.name}.tmp")
+        tmp_path.write_text(json.dumps(state), encoding="utf-8")
+        os.replace(tmp_path, self.path)
+        self.saves += 1
+
+    def summary(self) -> dict:
+        """The `summary` method returns whether the crawl started warm and how often the state was saved."""
+        return {"path": str(self.path), "warm_start": self.warm, "saves": self.saves}
@@ -0,0 +1,107 @@
+"""task_matrix.py expands search terms and location sets into the `(term, city)` tasks of a crawl."""
+
+import argparse
+import hashlib
+from pathlib import Path
+
+from keyword_const import INTERNATIONAL_CITIES, US_CITIES
+
+LOCATION_SETS = {
+    "us": US_CITIES,
+    "international": INTERNATIONAL_CITIES,
+}
+
+
+def read_lines(path: str) -> list[str]:
+    """The `read_lines` function returns the non-empty lines of a text file, ignoring `#` comments."""
+    lines = Path(path).read_text(encoding="utf-8").splitlines()
+    return [line.strip() for line in lines if line.strip() and not line.startswith("#")]
+
+
+def resolve_locations(location_set: str) -> list[str]:
+    """The `resolve_locations` function returns the cities of a named location set or location file.
+
+    Parameters
+    ----------
+    location_set : str
+        The `location_set` parameter is either a key of `LOCATION_SETS` or the path of a text file with one
+    location per line.
+
+    Returns
+    -------
+        The list of locations.
+
+    """
+    if location_set in LOCATION_SETS:
+        return LOCATION_SETS[location_set]
+    if Path(location_set).is_file():
+        return read_lines(location_set)
+    raise ValueError(
+        f"Unknown location set '{location_set}', expected one of "
+        f"{sorted(LOCATION_SETS)} or a file"
+    )
+
+
+def unique(values: list[str]) -> list[str]:
+    """The `unique` function drops repeated values, compared without case and extra whitespace."""
+    seen = set()
+    result = []
+    for value in values:
+        key = " ".join(value.split()).casefold()
+        if key not in seen:
+            seen.add(key)
+            result.append(" ".join(value.split()))
+    return result
+
+
+def build_task_matrix(
+    terms: list[str], location_sets: list[str]
+) -> list[tuple[str, str]]:
+    """The `build_task_matrix` function crosses every term with every location.
+
+    Parameters
+    ----------
+    terms : list[str]
+        The `terms` parameter holds the job terms to search.
+    location_sets : list[str]
+        The `location_sets` parameter holds names of `LOCATION_SETS` or location files.
+
+    Returns
+    -------
+        The deduplicated `(term, city)` tasks, grouped by term in the given order.
+
+    """
+    cities = unique(
+        [city for name in location_sets for city in resolve_locations(name)]
+    )
+    return [(term, city) for term in unique(terms) for city in cities]
+
+
+def shard_of(task: tuple[str, str], shard_count: int) -> int:
+    """The `shard_of` function returns the shard, from 1 to `shard_count`, a `(term, city)` task belongs to.
+
+    The shard only depends on the task itself, hashed without case and extra whitespace, so adding or
+    removing a city never moves the other tasks to another shard.
+
+    """
+    key = "\n".join(" ".join(value.split()).casefold() for value in task)
+    digest = hashlib.sha1(key.encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") % shard_count + 1
+
+
+def select_shard(
+    tasks: list[tuple[str, str]], shard_index: int, shard_count: int
+) -> list[tuple[str, str]]:
+    """The `select_shard` function keeps the tasks of shard `shard_index` out of `shard_count`."""
+    return [task for task in tasks if shard_of(task, shard_count) == shard_index]
+
+
+def parse_shard(value: str) -> tuple[int, int]:
+    """The `parse_shard` function parses a `--shard` value such as `2/5` into `(2, 5)`."""
+    try:
+        index, count = (int(part) for part in value.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected I/K, got '{value}'") from None
+    if not 1 <= index <= count:
+        raise argparse.ArgumentTypeError(f"shard {index} is not between 1 and {count}")
+    return index, count
@@ -0,0 +1,212 @@
+"""task_queue.py lets several scraper processes share one `(term, city)` task list through a SQLite file.
+
+Every worker leases tasks from the queue instead of walking its own list. A lease expires after
+`lease_seconds` unless the worker keeps renewing it with heartbeats, so the tasks of a crashed worker go
+back to the queue and are picked up by the others. A task is only handed to one live worker at a time.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Iterable
+import logging
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+Task = tuple[str, str]
+
+PENDING = "pending"
+LEASED = "leased"
+DONE = "done"
+FAILED = "failed"
+
+
+class TaskQueue:
+    """The `TaskQueue` class leases crawl tasks from a SQLite file shared by all workers.
+
+    It has the same `add_tasks`, `mark_in_flight`, `mark_done`, `mark_failed` and `counts` methods as
+    `CrawlJournal`, so `main` can track progress through either of them.
+
+    Parameters
+    ----------
+    path : str
+        The `path` parameter is the SQLite file of the queue, created by the first worker that opens it.
+    worker_id : str
+        The `worker_id` parameter identifies this worker in the leases it holds.
+    lease_seconds : float
+        The `lease_seconds` parameter is how long a lease stays valid without a heartbeat.
+    max_attempts : int
+        The `max_attempts` parameter is how many times a task is leased before it is given up as failed.
+
+    """
+
+    def __init__(
+        self,
+        path: str,
+        worker_id: str,
+        lease_seconds: float = 300.0,
+        max_attempts: int = 3,
+    ) -> None:
+        self.path = path
+        self.worker_id = worker_id
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.connection = sqlite3.connect(path, isolation_level=None, timeout=30)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS tasks (
+                term TEXT NOT NULL,
+                city TEXT NOT NULL,
+                status TEXT NOT NULL,
+                worker TEXT,
+                lease_expires REAL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                output TEXT,
+                error TEXT,
+                PRIMARY KEY (term, city)
+            )
+            """)
+        # Every write waits on the write lock of the other workers, so writes run in a thread with a
+        # connection of their own and never block the event loop
+        self.lease_connection = sqlite3.connect(
+            path, isolation_level=None, timeout=30, check_same_thread=False
+        )
+        self.lease_lock = threading.Lock()
+
+    def add_tasks(self, tasks: Iterable[Task]) -> None:
+        """The `add_tasks` method queues `tasks`, ignoring those another worker already queued.
+
+        Like every write to the queue, it blocks while another worker writes, `main` calls it in a thread.
+
+        """
+        with self.lease_lock:
+            self.lease_connection.executemany(
+                "INSERT OR IGNORE INTO tasks (term, city, status) VALUES (?, ?, ?)",
+                [(term, city, PENDING) for term, city in tasks],
+            )
+
+    def try_lease(self) -> Task | None:
+        """The `try_lease` method leases one pending or expired task, or returns None if there is none.
+
+        It blocks while another worker writes to the queue, `lease` calls it in a thread.
+
+        """
+        with self.lease_lock:
+            return self._try_lease()
+
+    def _try_lease(self) -> Task | None:
+        """The `_try_lease` method runs the lease transaction, holding `lease_lock`."""
+        connection = self.lease_connection
+        now = time.time()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            row = connection.execute(
+                "SELECT term, city FROM tasks WHERE attempts < ? AND "
+                "(status = ? OR (status = ? AND lease_expires < ?)) LIMIT 1",
+                (self.max_attempts, PENDING, LEASED, now),
+            ).fetchone()
+            if row is not None:
+                connection.execute(
+                    "UPDATE tasks SET status = ?, worker = ?, lease_expires = ?, "
+                    "attempts = attempts + 1 WHERE term = ? AND city = ?",
+                    (LEASED, self.worker_id, now + self.lease_seconds, *row),
+                )
+            # Expired leases that used up their attempts are not coming back
+            connection.execute(
+                "UPDATE tasks SET status = ? WHERE status = ? AND lease_expires < ? "
+                "AND attempts >= ?",
+                (FAILED, LEASED, now, self.max_attempts),
+            )
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        return tuple(row) if row is not None else None
+
+    def is_drained(self) -> bool:
+        """The `is_drained` method tells whether no task is pending or leased anymore."""
+        with self.lease_lock:
+            row = self.lease_connection.execute(
+                "SELECT COUNT(*) FROM tasks WHERE status IN (?, ?)", (PENDING, LEASED)
+            ).fetchone()
+        return row[0] == 0
+
+    async def lease(self, poll_interval: float = 5.0) -> Task | None:
+        """The `lease` method waits for a task to lease and returns None once the queue is drained.
+
+        While other workers still hold leases, it keeps polling, because their tasks come back to the
+        queue if those workers die.
+
+        """
+        while True:
+            task = await asyncio.to_thread(self.try_lease)
+            if task is not None or await asyncio.to_thread(self.is_drained):
+                return task
+            await asyncio.sleep(poll_interval)
+
+    def heartbeat(self) -> None:
+        """The `heartbeat` method renews every lease held by this worker."""
+        with self.lease_lock:
+            self.lease_connection.execute(
+                "UPDATE tasks SET lease_expires = ? WHERE worker = ? AND status = ?",
+                (time.time() + self.lease_seconds, self.worker_id, LEASED),
+            )
+
+    async def keep_alive(self) -> None:
+        """The `keep_alive` coroutine renews the leases of this worker until it is cancelled."""
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            await asyncio.to_thread(self.heartbeat)
+
+    def mark_in_flight(self, term: str, city: str) -> None:
+        """The `mark_in_flight` method does nothing, leasing a task already marks it in flight."""
+
+    def mark_done(
+        self, term: str, city: str, output_part: int, output_offset: int, **_positions
+    ) -> None:
+        """The `mark_done` method completes the task if this worker still holds its lease. The positions
+        of the other files are ignored, a worker never resumes them.
+
+        """
+        with self.lease_lock:
+            self.lease_connection.execute(
+                "UPDATE tasks SET status = ?, output = ?, error = NULL "
+                "WHERE term = ? AND city = ? AND worker = ? AND status = ?",
+                (
+                    DONE,
+                    f"{self.worker_id}:{output_part}:{output_offset}",
+                    term,
+                    city,
+                    self.worker_id,
+                    LEASED,
+                ),
+            )
+
+    def mark_failed(self, term: str, city: str, error: str) -> None:
+        """The `mark_failed` method gives the task back to the queue, or fails it for good once it used
+        up its attempts.
+
+        """
+        with self.lease_lock:
+            self.lease_connection.execute(
+                "UPDATE tasks SET status = CASE WHEN attempts >= ? THEN ? ELSE ? END, "
+                "worker = NULL, error = ? WHERE term = ? AND city = ? AND worker = ?",
+                (self.max_attempts, FAILED, PENDING, error, term, city, self.worker_id),
+            )
+
+    def counts(self) -> dict[str, int]:
+        """The `counts` method returns the number of tasks per status."""
+        return dict(
+            self.connection.execute(
+                "SELECT status, COUNT(*) FROM tasks GROUP BY status"
+            ).fetchall()
+        )
+
+    def close(self) -> None:
+        """The `close` method closes the SQLite connections."""
+        self.connection.close()
+        with self.lease_lock:
+            self.lease_connection.close()